@@ -1,8 +1,12 @@
 from flask import Flask, jsonify
 from flask_cors import CORS
-from routes import vendors, wallets, expenses, payments, deposits, sync
+from routes import vendors, wallets, expenses, payments, deposits, sync, export, changes
+from encoding import FastJSONProvider, compress_response
 
 app = Flask(__name__)
+# orjson/msgspec serialization when installed, gzip/brotli for large responses
+app.json = FastJSONProvider(app)
+app.after_request(compress_response)
 # Allow CORS for Frontend running on Port 8000 or 8080
 CORS(app, resources={r"/v1/*": {"origins": ["http://localhost:8000", "http://localhost:8080"]}})
 
@@ -20,6 +24,8 @@ app.register_blueprint(expenses.bp)
 app.register_blueprint(payments.bp)
 app.register_blueprint(deposits.bp)
 app.register_blueprint(sync.bp)
+app.register_blueprint(export.bp)
+app.register_blueprint(changes.bp)
 
 # Global Error Handler
 @app.errorhandler(404)
@@ -0,0 +1,156 @@
+"""Benchmarks the large list endpoints: JSON encoder and response compression.
+
+Usage (from the backend folder):
+    python benchmarks/bench_api.py                       # 10k and 100k rows
+    python benchmarks/bench_api.py --sizes 100000 --requests 50
+
+For each dataset size the Flask app is served from a fresh process over a
+temporary data folder (no sync thread, no Google Sheets). Every list endpoint
+is requested with the stdlib JSON provider and with FastJSONProvider
+(orjson/msgspec), once per Accept-Encoding, with the response caches off so
+each request serializes and compresses again. A last "cached" pass shows
+repeat requests with the caches on. Latency and bytes on the wire are
+reported per variant and written as JSON to benchmarks/results/ (or --out).
+"""
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import types
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+ENDPOINTS = ['/v1/expenses', '/v1/payments', '/v1/deposits']
+
+
+def run_one(size, requests, seed, queue):
+    """Runs every endpoint/variant for one dataset size (in a child process)"""
+    sys.path.insert(0, BACKEND_DIR)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from bench_service import generate, _percentile
+    from services.sheets import SheetsService
+
+    import builtins
+    if "--verbose" not in sys.argv:
+        builtins.print = lambda *a, **k: None # The service logs every operation
+
+    data_dir = tempfile.mkdtemp(prefix=f"bench-api-{size}-")
+    try:
+        with open(os.path.join(data_dir, 'settings.json'), 'w') as f:
+            json.dump({"journal_fsync": False}, f)
+        service = SheetsService(base_path=data_dir, start_sync=False)
+        service.store.replace_all(generate(size, random.Random(seed)))
+
+        # Routes import the `db` singleton; point it at the benchmark service
+        db = types.ModuleType('db')
+        db.service = service
+        sys.modules['db'] = db
+        import encoding
+        import utils
+        from app import app
+        from flask.json.provider import DefaultJSONProvider
+
+        client = app.test_client()
+        encodings = ['identity', 'gzip'] + (['br'] if encoding.brotli else [])
+        providers = {'json': DefaultJSONProvider(app), 'fast': encoding.FastJSONProvider(app)}
+        labels = {'json': 'json', 'fast': providers['fast'].engine} # 'json' too if neither is installed
+        cache_sizes = (utils.RESPONSE_CACHE_BYTES, encoding.COMPRESSED_CACHE_ENTRIES)
+
+        def measure(path, enc):
+            latencies, wire = [], 0
+            for _ in range(requests):
+                t = time.perf_counter()
+                res = client.get(path, headers={'Accept-Encoding': enc})
+                body = res.get_data()
+                latencies.append(time.perf_counter() - t)
+                if res.status_code != 200:
+                    raise Exception(f"{path} returned {res.status_code}")
+                wire = len(body)
+            latencies.sort()
+            return {
+                "p50_ms": round(_percentile(latencies, 50) * 1000, 3),
+                "p99_ms": round(_percentile(latencies, 99) * 1000, 3),
+                "bytes": wire
+            }
+
+        results = []
+        for path in ENDPOINTS:
+            # Caches off: every request serializes and compresses
+            utils.RESPONSE_CACHE_BYTES, encoding.COMPRESSED_CACHE_ENTRIES = 0, 0
+            for name, provider in providers.items():
+                app.json = provider
+                for enc in encodings:
+                    results.append({"endpoint": path, "serializer": labels[name],
+                                    "encoding": enc, "cached": False, **measure(path, enc)})
+            # Caches on: repeat requests reuse the serialized and compressed bodies
+            utils.RESPONSE_CACHE_BYTES, encoding.COMPRESSED_CACHE_ENTRIES = cache_sizes
+            app.json = providers['fast']
+            for enc in encodings:
+                results.append({"endpoint": path, "serializer": labels['fast'],
+                                "encoding": enc, "cached": True, **measure(path, enc)})
+
+        queue.put({
+            "size": size,
+            "rows": {res: len(service.store.all(res)) for res in ('Expenses', 'Payments', 'Deposits')},
+            "results": results
+        })
+    except Exception as e:
+        queue.put({"size": size, "error": f"{type(e).__name__}: {e}"})
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List endpoint serialization and compression benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--requests", type=int, default=20, help="requests measured per variant")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="results file (default: benchmarks/results/api-<timestamp>.json)")
+    parser.add_argument("--verbose", action="store_true", help="keep the service's log output")
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    report = {
+        "benchmark": "api",
+        "time": datetime.datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "requests": args.requests,
+        "seed": args.seed,
+        "runs": []
+    }
+    for size in args.sizes:
+        print(f"[BENCH] API @ {size} rows...")
+        queue = ctx.Queue()
+        proc = ctx.Process(target=run_one, args=(size, args.requests, args.seed, queue))
+        proc.start()
+        result = queue.get()
+        proc.join()
+        report["runs"].append(result)
+        if "error" in result:
+            print(f"[BENCH]   failed: {result['error']}")
+            continue
+        for r in result["results"]:
+            print(f"[BENCH]   {r['endpoint']:<14} {r['serializer']:<8} {r['encoding']:<9} "
+                  f"{'cached' if r['cached'] else '':<7} p50 {r['p50_ms']:>9} ms  "
+                  f"p99 {r['p99_ms']:>9} ms  {r['bytes']:>11} B")
+
+    out = args.out
+    if not out:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        out = os.path.join(RESULTS_DIR, f"api-{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"[BENCH] Results saved to {out}")
+
+
+if __name__ == "__main__":
+    main()
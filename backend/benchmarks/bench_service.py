@@ -0,0 +1,284 @@
+"""Benchmarks SheetsService CRUD and payment processing as the local data grows.
+
+Usage (from the backend folder):
+    python benchmarks/bench_service.py                       # 1k, 10k, 100k, 1M rows
+    python benchmarks/bench_service.py --sizes 1000 10000 --engine sqlite
+    python benchmarks/bench_service.py --compare benchmarks/results/<previous>.json
+
+Each (engine, size) run happens in a fresh process with its own temporary
+data folder, so peak RSS is per run. The background sync thread is not
+started; only local operations are measured. Results are written as JSON to
+benchmarks/results/ (or --out).
+"""
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+# Share of the total row count per resource
+MIX = {"Vendors": 0.02, "Wallets": 0.005, "Expenses": 0.5, "Payments": 0.3, "Deposits": 0.175}
+
+
+def generate(size, rng):
+    """Synthetic dataset of about `size` rows with consistent foreign keys"""
+    counts = {res: max(5, int(size * share)) for res, share in MIX.items()}
+    vendors = [f"VND-{i:07d}" for i in range(counts["Vendors"])]
+    wallets = [f"WLT-{i:05d}" for i in range(counts["Wallets"])]
+    categories = ["Poultry", "Logistics", "Feed", "Utilities", "Labour"]
+
+    def day(i):
+        return (datetime.date(2024, 1, 1) + datetime.timedelta(days=i % 700)).isoformat()
+
+    data = {
+        "Vendors": [{"id": v, "name": f"Vendor {i}", "address": f"Shop {i}", "phone": f"080{i:08d}"}
+                    for i, v in enumerate(vendors)],
+        "Wallets": [{"id": w, "name": f"Wallet {i}", "balance": 10 ** 12, "currency": "NGN"}
+                    for i, w in enumerate(wallets)],
+        "Expenses": [],
+        "Payments": [],
+        "Deposits": []
+    }
+    for i in range(counts["Expenses"]):
+        total = rng.randint(1000, 100000)
+        data["Expenses"].append({
+            "id": f"AEX-{i:07d}", "vendorId": rng.choice(vendors), "date": day(i),
+            "total": total, "balance": total, "status": "Unpaid",
+            "category": rng.choice(categories), "description": "Synthetic expense"
+        })
+    expenses = data["Expenses"]
+    for i in range(counts["Payments"]):
+        exp = rng.choice(expenses)
+        data["Payments"].append({
+            "id": f"PAY-{i:07d}", "date": day(i), "amount": 1000,
+            "walletId": rng.choice(wallets), "vendorId": exp["vendorId"],
+            "refs": json.dumps([{"id": exp["id"], "amount": 1000}])
+        })
+    for i in range(counts["Deposits"]):
+        data["Deposits"].append({
+            "id": f"DEP-{i:07d}", "date": day(i), "amount": rng.randint(1000, 50000),
+            "walletId": rng.choice(wallets), "vendorId": rng.choice(vendors),
+            "source": "Vendor Transfer", "notes": ""
+        })
+    return data
+
+
+def _bytes_written():
+    """Bytes passed to write() by this process so far (Linux), else None"""
+    try:
+        with open('/proc/self/io') as f:
+            for line in f:
+                if line.startswith('wchar:'):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0
+    k = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+def measure(name, fn, args_list, data_dir):
+    """Calls fn(*args) for each args tuple; returns throughput, latency and I/O stats"""
+    latencies = []
+    errors = 0
+    io_before, disk_before = _bytes_written(), _dir_size(data_dir)
+    start = time.perf_counter()
+    for args in args_list:
+        t = time.perf_counter()
+        try:
+            fn(*args)
+        except Exception:
+            errors += 1
+        latencies.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - start
+    io_after = _bytes_written()
+
+    n = len(latencies)
+    latencies.sort()
+    if io_before is not None and io_after is not None:
+        written = io_after - io_before
+    else:
+        written = max(0, _dir_size(data_dir) - disk_before)
+    return {
+        "op": name,
+        "count": n,
+        "errors": errors,
+        "ops_per_sec": round(n / elapsed, 1) if elapsed else None,
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 4),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 4),
+        "bytes_written_per_op": round(written / n, 1) if n else 0
+    }
+
+
+def run_one(engine, size, ops, seed, overrides, queue):
+    """Runs every benchmark for one engine and dataset size (in a child process)"""
+    sys.path.insert(0, BACKEND_DIR)
+    from services.sheets import SheetsService
+
+    import builtins
+    quiet = "--verbose" not in sys.argv
+    if quiet:
+        builtins.print = lambda *a, **k: None # The service logs every operation
+
+    rng = random.Random(seed)
+    data_dir = tempfile.mkdtemp(prefix=f"bench-{engine}-{size}-")
+    try:
+        settings = {"storage_engine": engine, **overrides}
+        with open(os.path.join(data_dir, 'settings.json'), 'w') as f:
+            json.dump(settings, f)
+
+        t = time.perf_counter()
+        service = SheetsService(base_path=data_dir, start_sync=False)
+        dataset = generate(size, rng)
+        service.store.replace_all(dataset)
+        service.store.flush()
+        load_s = time.perf_counter() - t
+
+        vendors = [r["id"] for r in dataset["Vendors"]]
+        wallets = [r["id"] for r in dataset["Wallets"]]
+        expenses = [r["id"] for r in dataset["Expenses"]]
+        rows = sum(len(v) for v in dataset.values())
+        del dataset
+
+        results = []
+        results.append(measure("get_by_id", service.get_by_id,
+                               [("Expenses", rng.choice(expenses)) for _ in range(ops)], data_dir))
+        results.append(measure("get_all", service.get_all,
+                               [("Expenses",) for _ in range(max(3, ops // 100))], data_dir))
+
+        new_ids = [f"BEX-{i:07d}" for i in range(ops)]
+        results.append(measure("create", service.create, [("Expenses", {
+            "id": new_id, "vendorId": rng.choice(vendors), "date": "2025-06-01",
+            "total": 5000, "balance": 5000, "status": "Unpaid",
+            "category": "Feed", "description": "Benchmark expense"
+        }) for new_id in new_ids], data_dir))
+        results.append(measure("update", service.update,
+                               [("Expenses", rng.choice(expenses), {"description": f"Edited {i}"})
+                                for i in range(ops)], data_dir))
+        results.append(measure("process_payment", service.process_payment, [({
+            "id": f"BPY-{i:07d}", "date": "2025-06-02", "amount": 100,
+            "walletId": rng.choice(wallets), "vendorId": rng.choice(vendors),
+            "allocations": [{"id": rng.choice(expenses), "amount": 100}]
+        },) for i in range(ops)], data_dir))
+        # Vendors referenced by expenses: dependency check finds a link and refuses
+        results.append(measure("delete_blocked", service.delete,
+                               [("Vendors", rng.choice(vendors)) for _ in range(ops)], data_dir))
+        # Expenses created above are unreferenced: dependency check passes, row is removed
+        results.append(measure("delete", service.delete,
+                               [("Expenses", new_id) for new_id in new_ids], data_dir))
+
+        service.store.close()
+        queue.put({
+            "engine": engine,
+            "size": size,
+            "rows": rows,
+            "load_s": round(load_s, 3),
+            "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, # KB on Linux
+            "disk_bytes": _dir_size(data_dir),
+            "ops": results
+        })
+    except Exception as e:
+        queue.put({"engine": engine, "size": size, "error": f"{type(e).__name__}: {e}"})
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def compare(current, previous):
+    """Prints ops/sec and p99 changes against a previous results file"""
+    old = {(r["engine"], r["size"], o["op"]): o for r in previous.get("runs", []) for o in r.get("ops", [])}
+    print(f"\n{'engine':<7} {'size':>8} {'op':<16} {'ops/s':>12} {'change':>8} {'p99 ms':>10} {'change':>8}")
+    for r in current["runs"]:
+        for o in r.get("ops", []):
+            p = old.get((r["engine"], r["size"], o["op"]))
+            if not p:
+                continue
+            d_ops = (o["ops_per_sec"] / p["ops_per_sec"] - 1) * 100 if p["ops_per_sec"] else 0
+            d_p99 = (o["p99_ms"] / p["p99_ms"] - 1) * 100 if p["p99_ms"] else 0
+            print(f"{r['engine']:<7} {r['size']:>8} {o['op']:<16} {o['ops_per_sec']:>12} {d_ops:>+7.1f}% {o['p99_ms']:>10} {d_p99:>+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SheetsService local operation benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    parser.add_argument("--engine", choices=["json", "sqlite", "both"], default="json")
+    parser.add_argument("--ops", type=int, default=1000, help="operations measured per benchmark")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--settings", default="{}", help='JSON settings overrides, e.g. \'{"journal_fsync": false}\'')
+    parser.add_argument("--out", help="results file (default: benchmarks/results/service-<timestamp>.json)")
+    parser.add_argument("--compare", help="previous results file to compare against")
+    parser.add_argument("--verbose", action="store_true", help="keep the service's log output")
+    args = parser.parse_args()
+
+    engines = ["json", "sqlite"] if args.engine == "both" else [args.engine]
+    overrides = json.loads(args.settings)
+    ctx = multiprocessing.get_context("spawn")
+
+    report = {
+        "benchmark": "service",
+        "time": datetime.datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "ops": args.ops,
+        "seed": args.seed,
+        "settings": overrides,
+        "runs": []
+    }
+    for engine in engines:
+        for size in args.sizes:
+            print(f"[BENCH] {engine} @ {size} rows...")
+            queue = ctx.Queue()
+            proc = ctx.Process(target=run_one, args=(engine, size, args.ops, args.seed, overrides, queue))
+            proc.start()
+            result = queue.get()
+            proc.join()
+            report["runs"].append(result)
+            if "error" in result:
+                print(f"[BENCH]   failed: {result['error']}")
+                continue
+            print(f"[BENCH]   loaded {result['rows']} rows in {result['load_s']}s, peak RSS {result['peak_rss_kb'] // 1024} MB")
+            for o in result["ops"]:
+                print(f"[BENCH]   {o['op']:<16} {o['ops_per_sec']:>12} ops/s  p50 {o['p50_ms']:>9} ms  "
+                      f"p99 {o['p99_ms']:>9} ms  {o['bytes_written_per_op']:>10} B/op"
+                      + (f"  ({o['errors']} raised)" if o['errors'] else ""))
+
+    out = args.out
+    if not out:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        out = os.path.join(RESULTS_DIR, f"service-{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"[BENCH] Results saved to {out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
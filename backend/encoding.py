@@ -0,0 +1,129 @@
+import gzip
+import threading
+from collections import OrderedDict
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+# Optional fast JSON encoders, used when installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Responses smaller than this are sent uncompressed
+COMPRESS_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# dumps() arguments the fast encoders can reproduce
+FAST_DUMP_ARGS = ({}, {'separators': (',', ':')}, {'indent': 2})
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that encodes with orjson (or msgspec) when available.
+
+    With orjson the output matches what jsonify() gets from the default
+    provider (sorted keys, compact; a bare dumps() is compact too): dates and
+    dataclasses are passed through to self.default, so they come out as HTTP
+    dates and sorted dicts, not ISO-8601. msgspec cannot hand those types
+    back, so under msgspec datetime/date are ISO-8601 strings and dataclass
+    fields keep their declared order. Anything the fast encoder rejects (e.g.
+    non-string keys) falls back to the stdlib.
+    """
+
+    def __init__(self, app):
+        super().__init__(app)
+        if orjson:
+            self.engine = 'orjson'
+        elif msgspec:
+            self.engine = 'msgspec'
+            self._msgspec = msgspec.json.Encoder(enc_hook=self.default, order='sorted')
+        else:
+            self.engine = 'json'
+
+    def dumps(self, obj, **kwargs):
+        # jsonify() asks for compact separators, or indent=2 in debug mode
+        if self.engine != 'json' and kwargs in FAST_DUMP_ARGS:
+            try:
+                if self.engine == 'orjson':
+                    option = (orjson.OPT_SORT_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+                              | (orjson.OPT_INDENT_2 if kwargs.get('indent') else 0))
+                    return orjson.dumps(obj, default=self.default, option=option).decode('utf-8')
+                data = self._msgspec.encode(obj)
+                if kwargs.get('indent'): data = msgspec.json.format(data, indent=2)
+                return data.decode('utf-8')
+            except TypeError:
+                pass
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson and not kwargs:
+            try:
+                return orjson.loads(s)
+            except orjson.JSONDecodeError:
+                pass # Let the stdlib raise its usual error
+        return super().loads(s, **kwargs)
+
+
+# Compressed bodies of versioned (ETag) responses: (path, etag, encoding) -> bytes
+COMPRESSED_CACHE_ENTRIES = 64
+_compressed = OrderedDict()
+_compressed_lock = threading.Lock()
+
+
+def _choose_encoding():
+    accepted = request.accept_encodings
+    if brotli and accepted['br'] and accepted['br'] >= accepted['gzip']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def _compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+
+def compress_response(response):
+    """after_request hook: gzip/brotli-encodes large JSON responses the client accepts"""
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or response.mimetype != 'application/json'
+            or 'Content-Encoding' in response.headers):
+        return response
+    response.vary.add('Accept-Encoding')
+
+    encoding = _choose_encoding()
+    data = response.get_data()
+    if not encoding or len(data) < COMPRESS_MIN_BYTES:
+        return response
+
+    etag, weak = response.get_etag()
+    key = (request.full_path, etag, encoding) if etag else None
+    body = None
+    if key:
+        with _compressed_lock:
+            body = _compressed.get(key)
+            if body is not None: _compressed.move_to_end(key)
+    if body is None:
+        body = _compress(data, encoding)
+        if key:
+            with _compressed_lock:
+                _compressed[key] = body
+                while len(_compressed) > COMPRESSED_CACHE_ENTRIES:
+                    _compressed.popitem(last=False)
+
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    if etag and not weak:
+        response.set_etag(etag, weak=True) # Same resource version, different bytes
+    return response
@@ -0,0 +1,45 @@
+from flask import Blueprint, request, current_app
+from db import service
+
+bp = Blueprint('changes', __name__, url_prefix='/v1/changes')
+
+# Comment line sent when nothing happened for this long, so proxies keep the connection open
+KEEPALIVE_SECONDS = 15
+# Reconnect delay suggested to EventSource clients
+RETRY_MS = 3000
+
+def format_event(event_id, event, data):
+    return f"id: {event_id}\nevent: {event}\ndata: {data}\n\n"
+
+@bp.route('', methods=['GET'])
+def stream_changes():
+    """Server-Sent Events: one event per changed record, plus sync status.
+
+    Resumes after the Last-Event-ID header (sent by EventSource on reconnect)
+    or the lastEventId query parameter. Without one the stream starts at the
+    current position; if the id cannot be resumed a 'reset' event comes first.
+    """
+    feed = service.changes
+    dumps = current_app.json.dumps
+    last_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+    start = feed.seq if last_id is None else feed.parse_id(last_id) # Fixed now, not at the first read
+
+    def stream():
+        yield f"retry: {RETRY_MS}\n\n"
+        seq = start
+        while True:
+            events = None if seq is None else feed.since(seq, KEEPALIVE_SECONDS)
+            if events is None:
+                # Unknown id or events already dropped: the client must reload
+                seq = feed.seq
+                yield format_event(feed.event_id(seq), 'reset', dumps({"reason": "resume"}))
+            elif not events:
+                yield ": keepalive\n\n"
+            else:
+                yield ''.join(format_event(feed.event_id(s), event, dumps(data)) for s, event, data in events)
+                seq = events[-1][0]
+
+    res = current_app.response_class(stream(), mimetype='text/event-stream')
+    res.headers['Cache-Control'] = 'no-cache'
+    res.headers['X-Accel-Buffering'] = 'no' # Stops nginx from buffering the stream
+    return res
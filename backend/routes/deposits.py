@@ -1,13 +1,18 @@
-from flask import Blueprint
+from flask import Blueprint, request
 from db import service
-from utils import response
+from utils import response, list_params, cached_response
 
 bp = Blueprint('deposits', __name__, url_prefix='/v1/deposits')
 
 @bp.route('', methods=['GET'])
 def get_deposits():
     try:
-        deposits = service.get_all('Deposits')
-        return response(0, "success", {"deposits": deposits})
+        params = list_params(request.args, {'walletId': 'walletId', 'vendorId': 'vendorId'})
+        def build():
+            deposits, next_cursor = service.query('Deposits', **params)
+            return response(0, "success", {"deposits": deposits, "next_cursor": next_cursor})
+        return cached_response(service.version_of('Deposits'), build)
+    except ValueError as e:
+        return response(400, str(e))
     except Exception as e:
         return response(500, str(e))
@@ -1,47 +1,69 @@
 from flask import Blueprint, request
 from db import service
-from utils import response, generate_id, today
+from utils import response, generate_id, today, list_params, cached_response, bulk_create
 
 bp = Blueprint('expenses', __name__, url_prefix='/v1/expenses')
 
 @bp.route('', methods=['GET'])
 def get_expenses():
     try:
-        expenses = service.get_all('Expenses')
-        return response(0, "success", {"expenses": expenses})
+        params = list_params(request.args, {'vendorId': 'vendorId', 'status': 'status', 'category': 'category'})
+        def build():
+            expenses, next_cursor = service.query('Expenses', **params)
+            return response(0, "success", {"expenses": expenses, "next_cursor": next_cursor})
+        return cached_response(service.version_of('Expenses'), build)
+    except ValueError as e:
+        return response(400, str(e))
     except Exception as e:
         return response(500, str(e))
 
 @bp.route('/<id>', methods=['GET'])
 def get_expense_by_id(id):
     try:
-        expense = service.get_by_id('Expenses', id)
-        if not expense:
-            return response(404, "Expense not found")
-        return response(0, "success", {"expense": expense})
+        def build():
+            expense = service.get_by_id('Expenses', id)
+            if not expense:
+                return response(404, "Expense not found")
+            return response(0, "success", {"expense": expense})
+        return cached_response(service.version_of('Expenses'), build)
     except Exception as e:
         return response(500, str(e))
 
+def build_expense(data, new_id):
+    total = float(data['total'])
+    return {
+        "id": new_id,
+        "vendorId": data['vendorId'],
+        "date": data.get('date', today()),
+        "total": total,
+        "balance": total,
+        "status": "Unpaid",
+        "category": data.get('category', 'Other'),
+        "description": data.get('description', '')
+    }
+
 @bp.route('', methods=['POST'])
 def create_expense():
     try:
-        data = request.json
-        total = float(data['total'])
-        new_expense = {
-            "id": generate_id('AEX'),
-            "vendorId": data['vendorId'],
-            "date": data.get('date', today()),
-            "total": total,
-            "balance": total,
-            "status": "Unpaid",
-            "category": data.get('category', 'Other'),
-            "description": data.get('description', '')
-        }
+        new_expense = build_expense(request.json, generate_id('AEX'))
         service.create('Expenses', new_expense)
         return response(0, "Expense recorded", {"expense": new_expense})
     except Exception as e:
         return response(500, str(e))
 
+@bp.route('/bulk', methods=['POST'])
+def create_expenses_bulk():
+    try:
+        data = request.json
+        items = data.get('expenses') if isinstance(data, dict) else data
+        results = bulk_create(service, 'Expenses', 'AEX', items, build_expense)
+        created = sum(1 for r in results if r['code'] == 0)
+        return response(0, f"{created} of {len(results)} expenses created", {"results": results})
+    except ValueError as e:
+        return response(400, str(e))
+    except Exception as e:
+        return response(500, str(e))
+
 @bp.route('/<id>', methods=['PATCH'])
 def update_expense(id):
     try:
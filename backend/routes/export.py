@@ -0,0 +1,83 @@
+from flask import Blueprint, request, current_app
+import csv
+import io
+import json
+from itertools import chain
+from db import service
+from services.storage import SORT_FIELDS
+from utils import response
+
+bp = Blueprint('export', __name__, url_prefix='/v1/export')
+
+RESOURCES = {
+    'vendors': 'Vendors',
+    'wallets': 'Wallets',
+    'expenses': 'Expenses',
+    'payments': 'Payments',
+    'deposits': 'Deposits'
+}
+
+# CSV columns, in order; fields not listed are appended in first-seen order of the first page
+COLUMNS = {
+    'Vendors': ['id', 'name', 'address', 'phone'],
+    'Wallets': ['id', 'name', 'balance', 'currency'],
+    'Expenses': ['id', 'vendorId', 'date', 'total', 'balance', 'status', 'category', 'description'],
+    'Payments': ['id', 'date', 'amount', 'walletId', 'vendorId', 'refs'],
+    'Deposits': ['id', 'date', 'amount', 'walletId', 'vendorId', 'source', 'notes']
+}
+
+# Records read per page (each page takes the service lock once)
+EXPORT_PAGE_SIZE = 500
+
+def csv_rows(columns, pages):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(columns)
+    for page in pages:
+        for record in page:
+            writer.writerow([
+                json.dumps(v) if isinstance(v, (list, dict)) else ('' if v is None else v)
+                for v in (record.get(c) for c in columns)
+            ])
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    yield buf.getvalue()
+
+def ndjson_rows(dumps, pages):
+    for page in pages:
+        yield ''.join(dumps(record) + '\n' for record in page)
+
+@bp.route('/<name>', methods=['GET'])
+def export_resource(name):
+    try:
+        resource = RESOURCES.get(name)
+        if not resource:
+            return response(404, f"Unknown resource '{name}'")
+        fmt = request.args.get('format', 'csv')
+        if fmt not in ('csv', 'ndjson'):
+            return response(400, "format must be 'csv' or 'ndjson'")
+
+        filters = {'vendorId': request.args['vendorId']} if request.args.get('vendorId') else {}
+        sort = 'date' if 'date' in SORT_FIELDS[resource] else None # Chronological when possible
+        pages = service.iter_pages(resource, filters, request.args.get('dateFrom'), request.args.get('dateTo'),
+                                   sort, EXPORT_PAGE_SIZE)
+        # Read the first page now so bad filters are reported as errors, not mid-stream
+        first = next(pages, None)
+        pages = chain([first], pages) if first else iter(())
+
+        if fmt == 'csv':
+            columns = list(COLUMNS[resource])
+            for record in first or []:
+                columns.extend(k for k in record if k not in columns)
+            body, mimetype = csv_rows(columns, pages), 'text/csv'
+        else:
+            body, mimetype = ndjson_rows(current_app.json.dumps, pages), 'application/x-ndjson'
+
+        res = current_app.response_class(body, mimetype=mimetype)
+        res.headers['Content-Disposition'] = f'attachment; filename={name}.{fmt}'
+        return res
+    except ValueError as e:
+        return response(400, str(e))
+    except Exception as e:
+        return response(500, str(e))
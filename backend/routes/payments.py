@@ -1,24 +1,31 @@
 from flask import Blueprint, request
 from db import service
-from utils import response, generate_id, today
+from utils import response, generate_id, today, list_params, cached_response
 
 bp = Blueprint('payments', __name__, url_prefix='/v1/payments')
 
 @bp.route('', methods=['GET'])
 def get_payments():
     try:
-        payments = service.get_all('Payments')
-        return response(0, "success", {"payments": payments})
+        params = list_params(request.args, {'walletId': 'walletId', 'vendorId': 'vendorId', 'expenseId': 'refs'})
+        def build():
+            payments, next_cursor = service.query('Payments', **params)
+            return response(0, "success", {"payments": payments, "next_cursor": next_cursor})
+        return cached_response(service.version_of('Payments'), build)
+    except ValueError as e:
+        return response(400, str(e))
     except Exception as e:
         return response(500, str(e))
 
 @bp.route('/<id>', methods=['GET'])
 def get_payment_by_id(id):
     try:
-        payment = service.get_by_id('Payments', id)
-        if not payment:
-            return response(404, "Payment not found")
-        return response(0, "success", {"payment": payment})
+        def build():
+            payment = service.get_by_id('Payments', id)
+            if not payment:
+                return response(404, "Payment not found")
+            return response(0, "success", {"payment": payment})
+        return cached_response(service.version_of('Payments'), build)
     except Exception as e:
         return response(500, str(e))
 
@@ -11,6 +11,11 @@ def get_sync_status():
         return response(0, "success", {
             "pending_count": len(service.pending_sync),
             "last_sync": service.last_sync_info,
+            "sync_stats": service.sync_stats,
+            "connection_stats": service.sheets_client.stats,
+            "throttle_stats": service.limiter.stats,
+            "emulator_stats": service.emulator.stats if service.emulator else None,
+            "pull_stats": service.last_pull_stats,
             "settings": service.settings
         })
     except Exception as e:
@@ -38,9 +43,10 @@ def update_settings():
 @bp.route('/force', methods=['POST'])
 def force_sync():
     try:
-        print("[API] Manual Sync Triggered. Dispatching background worker...")
-        thread = threading.Thread(target=service.full_sync)
-        thread.start()
+        print("[API] Manual Sync Triggered. Waking background worker...")
+        merged = service.scheduler.trigger()
+        if merged:
+            return response(0, "Sync already in progress; request merged into the current run")
         return response(0, "Full sync (Push + Pull) initiated in background")
     except Exception as e:
         print(f"[API] Error triggering sync: {str(e)}")
@@ -49,10 +55,11 @@ def force_sync():
 @bp.route('/pull', methods=['POST'])
 def force_pull():
     try:
+        full = request.args.get('full') == 'true' or bool((request.get_json(silent=True) or {}).get('full'))
         print("[API] Manual Pull Triggered. Dispatching background worker...")
-        thread = threading.Thread(target=service.pull_from_remote)
+        thread = threading.Thread(target=service.pull_from_remote, kwargs={"full": full})
         thread.start()
-        return response(0, "Full pull initiated in background")
+        return response(0, f"{'Full' if full else 'Incremental'} pull initiated in background")
     except Exception as e:
         print(f"[API] Error triggering pull: {str(e)}")
         return response(500, str(e))
@@ -1,27 +1,53 @@
 from flask import Blueprint, request
 from db import service
-from utils import response, generate_id
+from utils import response, generate_id, list_params, cached_response, bulk_create
 
 bp = Blueprint('vendors', __name__, url_prefix='/v1/vendors')
 
 @bp.route('', methods=['GET'])
 def get_vendors():
     try:
-        vendors = service.get_all('Vendors')
-        return response(0, "success", {"vendors": vendors})
+        params = list_params(request.args, {})
+        def build():
+            vendors, next_cursor = service.query('Vendors', **params)
+            return response(0, "success", {"vendors": vendors, "next_cursor": next_cursor})
+        return cached_response(service.version_of('Vendors'), build)
+    except ValueError as e:
+        return response(400, str(e))
+    except Exception as e:
+        return response(500, str(e))
+
+@bp.route('/summary', methods=['GET'])
+def get_vendor_summary():
+    try:
+        def build():
+            return response(0, "success", {"vendors": service.vendor_summary()})
+        return cached_response(service.version_of('Vendors', 'Expenses', 'Payments', 'Deposits'), build)
     except Exception as e:
         return response(500, str(e))
 
 @bp.route('/<id>', methods=['GET'])
 def get_vendor_by_id(id):
     try:
-        vendor = service.get_by_id('Vendors', id)
-        if not vendor:
-            return response(404, "Vendor not found")
-        return response(0, "success", {"vendor": vendor})
+        def build():
+            vendor = service.get_by_id('Vendors', id)
+            if not vendor:
+                return response(404, "Vendor not found")
+            return response(0, "success", {"vendor": vendor})
+        return cached_response(service.version_of('Vendors'), build)
     except Exception as e:
         return response(500, str(e))
 
+def build_vendor(data, new_id):
+    if not data.get('name'):
+        raise ValueError("Vendor name is required")
+    return {
+        "id": new_id,
+        "name": data['name'],
+        "address": data.get('address', ''),
+        "phone": data.get('phone', '')
+    }
+
 @bp.route('', methods=['POST'])
 def create_vendor():
     try:
@@ -29,17 +55,25 @@ def create_vendor():
         if not data.get('name'):
             return response(1001, "Vendor name is required")
         
-        new_vendor = {
-            "id": generate_id('VND'),
-            "name": data['name'],
-            "address": data.get('address', ''),
-            "phone": data.get('phone', '')
-        }
+        new_vendor = build_vendor(data, generate_id('VND'))
         service.create('Vendors', new_vendor)
         return response(0, "Vendor created", {"vendor": new_vendor})
     except Exception as e:
         return response(500, str(e))
 
+@bp.route('/bulk', methods=['POST'])
+def create_vendors_bulk():
+    try:
+        data = request.json
+        items = data.get('vendors') if isinstance(data, dict) else data
+        results = bulk_create(service, 'Vendors', 'VND', items, build_vendor)
+        created = sum(1 for r in results if r['code'] == 0)
+        return response(0, f"{created} of {len(results)} vendors created", {"results": results})
+    except ValueError as e:
+        return response(400, str(e))
+    except Exception as e:
+        return response(500, str(e))
+
 @bp.route('/<id>', methods=['PATCH'])
 def update_vendor(id):
     try:
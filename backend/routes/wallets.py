@@ -1,42 +1,83 @@
 from flask import Blueprint, request
 from db import service
-from utils import response, generate_id
+from utils import response, generate_id, list_params, cached_response, bulk_create
 
 bp = Blueprint('wallets', __name__, url_prefix='/v1/wallets')
 
+# Transactions per history page when `limit` is not given
+HISTORY_PAGE_SIZE = 50
+
 @bp.route('', methods=['GET'])
 def get_wallets():
     try:
-        wallets = service.get_all('Wallets')
-        return response(0, "success", {"wallets": wallets})
+        params = list_params(request.args, {})
+        def build():
+            wallets, next_cursor = service.query('Wallets', **params)
+            return response(0, "success", {"wallets": wallets, "next_cursor": next_cursor})
+        return cached_response(service.version_of('Wallets'), build)
+    except ValueError as e:
+        return response(400, str(e))
     except Exception as e:
         return response(500, str(e))
 
 @bp.route('/<id>', methods=['GET'])
 def get_wallet_by_id(id):
     try:
-        wallet = service.get_by_id('Wallets', id)
-        if not wallet:
-            return response(404, "Wallet not found")
-        return response(0, "success", {"wallet": wallet})
+        def build():
+            wallet = service.get_by_id('Wallets', id)
+            if not wallet:
+                return response(404, "Wallet not found")
+            return response(0, "success", {"wallet": wallet})
+        return cached_response(service.version_of('Wallets'), build)
     except Exception as e:
         return response(500, str(e))
 
+@bp.route('/<id>/history', methods=['GET'])
+def get_wallet_history(id):
+    try:
+        params = list_params(request.args, {})
+        def build():
+            result = service.wallet_history(id, params['limit'] or HISTORY_PAGE_SIZE, params['cursor'])
+            if result is None:
+                return response(404, "Wallet not found")
+            history, next_cursor = result
+            return response(0, "success", {"history": history, "next_cursor": next_cursor})
+        return cached_response(service.version_of('Wallets', 'Payments', 'Deposits'), build)
+    except ValueError as e:
+        return response(400, str(e))
+    except Exception as e:
+        return response(500, str(e))
+
+def build_wallet(data, new_id):
+    return {
+        "id": new_id,
+        "name": data['name'],
+        "balance": data.get('balance', 0),
+        "currency": data.get('currency', 'NGN')
+    }
+
 @bp.route('', methods=['POST'])
 def create_wallet():
     try:
-        data = request.json
-        new_wallet = {
-            "id": generate_id('WLT'),
-            "name": data['name'],
-            "balance": data.get('balance', 0),
-            "currency": data.get('currency', 'NGN')
-        }
+        new_wallet = build_wallet(request.json, generate_id('WLT'))
         service.create('Wallets', new_wallet)
         return response(0, "Wallet created", {"wallet": new_wallet})
     except Exception as e:
         return response(500, str(e))
 
+@bp.route('/bulk', methods=['POST'])
+def create_wallets_bulk():
+    try:
+        data = request.json
+        items = data.get('wallets') if isinstance(data, dict) else data
+        results = bulk_create(service, 'Wallets', 'WLT', items, build_wallet)
+        created = sum(1 for r in results if r['code'] == 0)
+        return response(0, f"{created} of {len(results)} wallets created", {"results": results})
+    except ValueError as e:
+        return response(400, str(e))
+    except Exception as e:
+        return response(500, str(e))
+
 @bp.route('/<id>', methods=['PATCH'])
 def update_wallet(id):
     try:
@@ -0,0 +1,155 @@
+from bisect import bisect_left, insort
+from services.storage import encode_cursor, decode_cursor
+
+
+class VendorAggregates:
+    """Per-vendor totals kept up to date as records change, instead of being
+    recomputed from every expense on each request.
+
+    For each vendor: outstanding balance and count of Expenses not yet Paid,
+    and the latest date of any Expense, Payment or Deposit linked to it.
+    Callers pass every change through add()/remove() (an update is remove of
+    the old record + add of the new one) and hold SheetsService.lock.
+    """
+
+    RESOURCES = ['Expenses', 'Payments', 'Deposits']
+
+    def __init__(self):
+        self.outstanding = {} # vendorId -> sum of unpaid expense balances
+        self.open_bills = {}  # vendorId -> count of unpaid expenses
+        self.dates = {}       # vendorId -> {date: number of records on that date}
+        self.last = {}        # vendorId -> latest date in self.dates
+
+    def rebuild(self, store):
+        self.__init__()
+        for res in self.RESOURCES:
+            for record in store.all(res):
+                self.add(res, record)
+
+    def add(self, resource, record, sign=1):
+        if resource not in self.RESOURCES or not record: return
+        vendor_id = record.get('vendorId')
+        if vendor_id is None or vendor_id == '': return
+        vendor_id = str(vendor_id)
+
+        # 1. Debt from unpaid expenses
+        if resource == 'Expenses' and record.get('status') != 'Paid':
+            self.outstanding[vendor_id] = self.outstanding.get(vendor_id, 0) + sign * _amount(record.get('balance'))
+            self.open_bills[vendor_id] = self.open_bills.get(vendor_id, 0) + sign
+            if not self.open_bills[vendor_id]:
+                del self.open_bills[vendor_id]
+                del self.outstanding[vendor_id] # Drops float residue
+
+        # 2. Last activity: count records per date so removals can find the new latest
+        date = record.get('date')
+        if not date: return
+        date = str(date)
+        counts = self.dates.setdefault(vendor_id, {})
+        counts[date] = counts.get(date, 0) + sign
+        if counts[date] <= 0:
+            del counts[date]
+        if not counts:
+            del self.dates[vendor_id]
+            self.last.pop(vendor_id, None)
+        elif sign > 0:
+            if date > self.last.get(vendor_id, ''): self.last[vendor_id] = date
+        elif self.last.get(vendor_id) == date and date not in counts:
+            self.last[vendor_id] = max(counts)
+
+    def remove(self, resource, record):
+        self.add(resource, record, sign=-1)
+
+    def get(self, vendor_id):
+        vendor_id = str(vendor_id)
+        return {
+            "outstanding": round(self.outstanding.get(vendor_id, 0), 2),
+            "openBills": self.open_bills.get(vendor_id, 0),
+            "lastActivity": self.last.get(vendor_id)
+        }
+
+
+class WalletLedger:
+    """Per-wallet index of Payments and Deposits ordered by (date, created, id).
+
+    `date` is only a day, so the `created` timestamp set when a payment or
+    deposit is processed keeps same-day entries in the order they changed
+    the balance. Records without one (older or pulled rows) sort first
+    within their day, by id.
+
+    Serves a wallet's history newest first with the balance after each
+    transaction. Balances are worked back from the wallet's current balance;
+    the page cursor carries the balance reached so far, so every page costs
+    O(log n + page size). Like VendorAggregates, callers pass every change
+    through add()/remove() and hold SheetsService.lock.
+    """
+
+    RESOURCES = {'Payments': -1, 'Deposits': 1} # Effect of each on the wallet balance
+
+    def __init__(self):
+        self.entries = {} # walletId -> sorted [(date, created, id, resource)]
+        self.effects = {} # (resource, id) -> signed amount
+
+    def rebuild(self, store):
+        self.__init__()
+        for res in self.RESOURCES:
+            for record in store.all(res):
+                self.add(res, record)
+
+    def _entry(self, resource, record):
+        wallet_id = record.get('walletId')
+        if wallet_id is None or wallet_id == '': return None, None
+        date, created = record.get('date'), record.get('created')
+        return str(wallet_id), ('' if date is None else str(date), '' if created is None else str(created),
+                                str(record.get('id')), resource)
+
+    def add(self, resource, record):
+        if resource not in self.RESOURCES or not record: return
+        wallet_id, entry = self._entry(resource, record)
+        if wallet_id is None: return
+        insort(self.entries.setdefault(wallet_id, []), entry)
+        self.effects[(resource, entry[2])] = self.RESOURCES[resource] * _amount(record.get('amount'))
+
+    def remove(self, resource, record):
+        if resource not in self.RESOURCES or not record: return
+        wallet_id, entry = self._entry(resource, record)
+        entries = self.entries.get(wallet_id)
+        if not entries: return
+        i = bisect_left(entries, entry)
+        if i < len(entries) and entries[i] == entry:
+            del entries[i]
+            self.effects.pop((resource, entry[2]), None)
+
+    def page(self, wallet_id, balance, limit, cursor=None):
+        """Returns ([(resource, id, effect, balance after)], next_cursor), newest first.
+
+        `balance` is the wallet's current balance; the cursor replaces it with
+        the balance before the last transaction of the previous page.
+        """
+        entries = self.entries.get(str(wallet_id), [])
+        end = len(entries)
+        after = decode_cursor(cursor)
+        if after is not None:
+            try:
+                key, balance = (after[0], after[1], after[2], after[3]), float(after[4])
+            except (IndexError, KeyError, TypeError, ValueError):
+                raise ValueError("Invalid cursor")
+            end = bisect_left(entries, key)
+
+        rows = []
+        for i in range(end - 1, max(-1, end - 1 - limit), -1):
+            _, _, id_key, resource = entries[i]
+            effect = self.effects.get((resource, id_key), 0)
+            rows.append((resource, id_key, effect, round(balance, 2)))
+            balance -= effect
+
+        next_cursor = None
+        if rows and end - len(rows) > 0:
+            next_cursor = encode_cursor(list(entries[end - len(rows)]) + [round(balance, 2)])
+        return rows, next_cursor
+
+
+def _amount(value):
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0
@@ -0,0 +1,66 @@
+import threading
+from collections import deque
+from itertools import islice
+
+
+class ChangeFeed:
+    """Bounded in-memory log of change events, numbered by a sequence.
+
+    SheetsService publishes one event per changed record (and sync status
+    updates); /v1/changes streams them to clients. Event ids are
+    '<epoch>-<seq>', so an id from before a restart never matches. Only the
+    last `size` events are kept: a client resuming from an older id gets
+    None from since() and has to reload everything.
+    """
+
+    def __init__(self, epoch, size=1000):
+        self.epoch = epoch
+        self.events = deque(maxlen=size) # (seq, event, data), seqs consecutive
+        self.seq = 0                     # Last sequence number handed out
+        self.cond = threading.Condition()
+
+    def publish(self, event, data):
+        self.publish_many([(event, data)])
+
+    def publish_many(self, items):
+        with self.cond:
+            for event, data in items:
+                self.seq += 1
+                self.events.append((self.seq, event, data))
+            self.cond.notify_all()
+
+    def event_id(self, seq):
+        return f"{self.epoch}-{seq}"
+
+    def parse_id(self, value):
+        """Sequence number in an event id from this feed, else None"""
+        epoch, _, seq = (value or '').rpartition('-')
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def since(self, seq, timeout=None):
+        """Events after `seq`, waiting up to `timeout` seconds for one.
+
+        Returns [] on timeout and None when `seq` is unknown or its
+        following events were already dropped.
+        """
+        with self.cond:
+            if timeout and self.seq == seq:
+                self.cond.wait(timeout)
+            if seq > self.seq:
+                return None
+            if seq == self.seq:
+                return []
+            if not self.events or self.events[0][0] > seq + 1:
+                return None
+            return list(islice(self.events, seq + 1 - self.events[0][0], None))
+
+
+def change_event(action, resource, id_val, record):
+    """('change', data) for one record: its new version, or just the id once deleted"""
+    data = {'resource': resource, 'action': action,
+            'id': str(record.get('id') if action == 'create' else id_val)}
+    if record is not None:
+        data['record'] = record
+    return 'change', data
@@ -0,0 +1,61 @@
+def _record_key(item):
+    if item['action'] == 'create':
+        id_val = (item.get('data') or {}).get('id')
+    else:
+        id_val = item.get('id_val')
+    return (item['resource'], str(id_val))
+
+
+def coalesce(items):
+    """Collapses each record's chain of pending changes into the minimal equivalent.
+
+    create -> update* -> delete   => nothing
+    create -> update*             => create (final data)
+    update -> update*             => update (final data)
+    update* -> delete             => delete
+    delete -> create              => kept as delete, then create
+
+    A surviving create/update is placed where the record's chain started, so
+    parents are still pushed before the children created after them; a
+    delete is placed where the chain ended, after the deletes of its
+    dependents. Returns (ops, saved) where saved is the number of remote
+    calls avoided.
+    """
+    slots = []      # Output positions: op dict, or None when cancelled
+    open_ops = {}   # record key -> slot index of the chain currently being built
+
+    for item in items:
+        key = _record_key(item)
+        action = item['action']
+        idx = open_ops.get(key)
+        current = slots[idx] if idx is not None else None
+
+        if current is None:
+            # Start a new chain
+            slots.append(dict(item))
+            open_ops[key] = len(slots) - 1
+            continue
+
+        if current['action'] == 'delete':
+            # Re-create after delete: keep both, start a new chain
+            slots.append(dict(item))
+            open_ops[key] = len(slots) - 1
+            continue
+
+        if action == 'update':
+            current['data'] = item['data']
+            current['timestamp'] = item.get('timestamp', current.get('timestamp'))
+        elif action == 'delete':
+            if current['action'] == 'create':
+                slots[idx] = None # Never reached the remote, nothing to do
+                del open_ops[key]
+            else:
+                slots[idx] = None
+                slots.append(dict(item))
+                open_ops[key] = len(slots) - 1
+        elif action == 'create':
+            # Duplicate create for a live record behaves like an update
+            current['data'] = item['data']
+
+    ops = [op for op in slots if op is not None]
+    return ops, len(items) - len(ops)
@@ -0,0 +1,8 @@
+import hashlib
+import json
+
+
+def row_fingerprint(record):
+    """Stable short hash of a record as pulled from the remote sheet"""
+    payload = json.dumps(record, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=12).hexdigest()
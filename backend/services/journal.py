@@ -0,0 +1,141 @@
+import json
+import os
+
+
+class LocalJournal:
+    """Snapshot file plus an append-only mutation log for the local database.
+
+    Every mutation is appended to the log as one JSON line, so a write costs
+    O(record size) instead of re-serializing the whole database. The snapshot
+    is rewritten only on compaction; startup loads the snapshot and replays
+    the log entries that are newer than it. Several mutations written
+    together share one 'batch' line, so they are replayed all or not at all.
+    """
+
+    META_KEY = '_log_seq'
+
+    def __init__(self, snapshot_file, log_file, compact_every=1000, fsync=True):
+        self.snapshot_file = snapshot_file
+        self.log_file = log_file
+        self.compact_every = max(1, int(compact_every))
+        self.fsync = fsync
+        self.seq = 0             # Sequence number of the last logged mutation
+        self.pending = 0         # Log entries written since the last compaction
+        self._log = None
+
+    def load(self):
+        """Returns the database dict rebuilt from snapshot + log tail"""
+        data = {}
+        if os.path.exists(self.snapshot_file):
+            try:
+                with open(self.snapshot_file, 'r') as f:
+                    data = json.load(f)
+            except:
+                data = {}
+
+        snapshot_seq = data.pop(self.META_KEY, 0) if isinstance(data, dict) else 0
+        if not isinstance(data, dict): data = {}
+        self.seq = snapshot_seq
+        self.pending = 0
+
+        # Replay log entries written after the snapshot
+        positions = {} # resource -> (id -> first position, id -> later positions)
+        if os.path.exists(self.log_file):
+            good_offset = 0
+            with open(self.log_file, 'rb') as f:
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break # Torn write at the tail, ignore the rest
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break
+                    good_offset += len(line)
+                    if entry.get('seq', 0) <= snapshot_seq:
+                        continue
+                    batch = entry['entries'] if entry.get('action') == 'batch' else [entry]
+                    for item in batch:
+                        self._replay(data, item, positions)
+                    self.seq = entry['seq']
+                    self.pending += len(batch)
+            # Cut the torn tail so new entries are not appended to it
+            if good_offset < os.path.getsize(self.log_file):
+                with open(self.log_file, 'r+b') as f:
+                    f.truncate(good_offset)
+
+        # Deletes left tombstones (None); drop them once instead of once per delete
+        for res, (_, _, dead) in positions.items():
+            if dead[0]:
+                data[res] = [r for r in data[res] if r is not None]
+        return data
+
+    def _replay(self, data, entry, positions):
+        res = entry['resource']
+        records = data.setdefault(res, [])
+        if res not in positions:
+            index, later = {}, {}
+            for i, r in enumerate(records):
+                id_key = str(r.get('id'))
+                if id_key in index: later.setdefault(id_key, []).append(i)
+                else: index[id_key] = i
+            positions[res] = (index, later, [0])
+        index, later, dead = positions[res]
+
+        action = entry['action']
+        id_str = str(entry.get('id_val'))
+        if action == 'create':
+            id_key = str(entry['data'].get('id'))
+            if id_key in index: later.setdefault(id_key, []).append(len(records))
+            else: index[id_key] = len(records)
+            records.append(entry['data'])
+        elif action == 'update':
+            if id_str in index:
+                records[index[id_str]] = entry['data']
+        elif action == 'delete':
+            # Every row with the id goes, like JsonStore._remove
+            for i in [index.pop(id_str, None)] + later.pop(id_str, []):
+                if i is not None:
+                    records[i] = None
+                    dead[0] += 1
+
+    def append(self, action, resource, id_val, data):
+        """Durably appends one mutation to the log"""
+        self.append_many([(action, resource, id_val, data)])
+
+    def append_many(self, entries):
+        """Durably appends (action, resource, id_val, data) mutations as one log line"""
+        if not entries: return
+        items = [{'action': action, 'resource': resource, 'id_val': id_val, 'data': data}
+                 for action, resource, id_val, data in entries]
+        self.seq += 1
+        entry = {'seq': self.seq, **(items[0] if len(items) == 1 else {'action': 'batch', 'entries': items})}
+        if self._log is None:
+            self._log = open(self.log_file, 'a')
+        self._log.write(json.dumps(entry) + '\n')
+        self._log.flush()
+        if self.fsync:
+            os.fsync(self._log.fileno())
+        self.pending += len(items)
+
+    def needs_compaction(self):
+        return self.pending >= self.compact_every
+
+    def compact(self, data):
+        """Writes a full snapshot atomically and truncates the log"""
+        snapshot = dict(data)
+        snapshot[self.META_KEY] = self.seq
+
+        tmp_file = self.snapshot_file + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump(snapshot, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.snapshot_file)
+
+        # Entries up to self.seq are now in the snapshot, so a crash before
+        # the truncate below is harmless: replay skips them by seq.
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+        open(self.log_file, 'w').close()
+        self.pending = 0
@@ -0,0 +1,132 @@
+import email.utils
+import random
+import threading
+import time
+import gspread
+
+
+class RateLimiter:
+    """Token bucket plus retry-with-backoff around Google Sheets API calls.
+
+    Settings:
+    - sheets_requests_per_minute (60): sustained request rate
+    - sheets_burst (10): requests allowed back to back before throttling
+    - sheets_max_retries (5): retries of a call failing with 429 or 5xx
+      (429 only for call_once(): appends and row deletes are not idempotent)
+    - sheets_backoff_base (1s) / sheets_backoff_max (64s): exponential backoff
+      bounds; full jitter is applied, and a Retry-After header wins when present
+    """
+
+    def __init__(self, get_settings):
+        self.get_settings = get_settings
+        self.lock = threading.Lock()
+        self.tokens = None
+        self.updated = time.monotonic()
+        self.stats = {
+            "calls": 0,
+            "throttled": 0,       # calls delayed locally by the token bucket
+            "rate_limited": 0,    # 429 responses
+            "server_errors": 0,   # 5xx responses
+            "retries": 0,
+            "wait_seconds": 0.0
+        }
+
+    def _acquire(self):
+        """Takes one token, sleeping until one is available"""
+        settings = self.get_settings()
+        rate = max(1, settings.get("sheets_requests_per_minute", 60)) / 60.0
+        burst = max(1, settings.get("sheets_burst", 10))
+
+        with self.lock:
+            now = time.monotonic()
+            if self.tokens is None:
+                self.tokens = burst
+            self.tokens = min(burst, self.tokens + (now - self.updated) * rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / rate if self.tokens < 0 else 0
+            self.stats["calls"] += 1
+            if wait:
+                self.stats["throttled"] += 1
+                self.stats["wait_seconds"] += wait
+
+        # The token is already reserved, so concurrent callers queue up behind us
+        if wait:
+            time.sleep(wait)
+
+    def call(self, fn, *args, **kwargs):
+        """Runs fn(*args, **kwargs) under the limiter, retrying 429 and 5xx responses"""
+        return self._call(fn, args, kwargs, retry_server_errors=True)
+
+    def call_once(self, fn, *args, **kwargs):
+        """Like call(), for writes that must not run twice (appends, row deletes).
+
+        Only 429 is retried: the request was rejected before it ran. A 5xx
+        may arrive after Google applied it, so it is raised instead; the
+        caller fails the push, and the next attempt re-checks the sheet.
+        """
+        return self._call(fn, args, kwargs, retry_server_errors=False)
+
+    def _call(self, fn, args, kwargs, retry_server_errors):
+        settings = self.get_settings()
+        max_retries = settings.get("sheets_max_retries", 5)
+        base = settings.get("sheets_backoff_base", 1)
+        cap = settings.get("sheets_backoff_max", 64)
+
+        attempt = 0
+        while True:
+            self._acquire()
+            try:
+                return fn(*args, **kwargs)
+            except gspread.exceptions.APIError as e:
+                status = _status_code(e)
+                if not is_retryable(status) or attempt >= max_retries:
+                    raise
+                if status != 429 and not retry_server_errors:
+                    with self.lock:
+                        self.stats["server_errors"] += 1
+                    raise
+
+                with self.lock:
+                    self.stats["rate_limited" if status == 429 else "server_errors"] += 1
+                    self.stats["retries"] += 1
+
+                delay = _retry_after(e)
+                if delay is None:
+                    delay = random.uniform(0, min(cap, base * (2 ** attempt)))
+                delay = min(delay, cap)
+                print(f"[SYNC] Sheets API returned {status}. Retrying in {delay:.1f}s ({attempt + 1}/{max_retries})...")
+                with self.lock:
+                    self.stats["wait_seconds"] += delay
+                time.sleep(delay)
+                attempt += 1
+
+
+def is_retryable(status):
+    return status == 429 or (status is not None and 500 <= status < 600)
+
+
+def _status_code(error):
+    response = getattr(error, 'response', None)
+    status = getattr(response, 'status_code', None)
+    if status is None:
+        status = getattr(error, 'code', None)
+    return status
+
+
+def _retry_after(error):
+    """Seconds requested by the Retry-After header (delta or HTTP date), or None"""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    value = headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+        return max(0.0, when.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,71 @@
+class RemoteSheetCache:
+    """Per-sync-cycle cache of worksheet handles, header rows and id -> row maps.
+
+    Each worksheet costs at most one `worksheet()`, one `row_values(1)` and one
+    `col_values(1)` call per cycle. The cache is updated locally after appends
+    and deletes, so row numbers stay correct without re-downloading the ids.
+    Remote reads go through `call` (e.g. RateLimiter.call) when given.
+    """
+
+    def __init__(self, sheet, call=None):
+        self.sheet = sheet
+        self.call = call or (lambda fn, *args, **kwargs: fn(*args, **kwargs))
+        self._worksheets = {}
+        self._headers = {}
+        self._ids = {}       # resource -> column A values (index 0 = row 1)
+        self._rows = {}      # resource -> {id: row number}, None when stale
+        self.fetches = 0
+
+    def worksheet(self, res):
+        if res not in self._worksheets:
+            self._worksheets[res] = self.call(self.sheet.worksheet, res)
+            self.fetches += 1
+        return self._worksheets[res]
+
+    def headers(self, res):
+        if res not in self._headers:
+            self._headers[res] = self.call(self.worksheet(res).row_values, 1)
+            self.fetches += 1
+        return self._headers[res]
+
+    def _load_ids(self, res):
+        if res not in self._ids:
+            self._ids[res] = self.call(self.worksheet(res).col_values, 1)
+            self._rows[res] = None
+            self.fetches += 1
+        return self._ids[res]
+
+    def row_of(self, res, id_val):
+        """Row number holding `id_val` in column A, or None"""
+        ids = self._load_ids(res)
+        if self._rows[res] is None:
+            rows = {}
+            for i, v in enumerate(ids):
+                rows.setdefault(v, i + 1) # First match wins, like list.index()
+            self._rows[res] = rows
+        return self._rows[res].get(str(id_val))
+
+    def note_headers(self, res, headers):
+        """Records a header row that was just written to an empty worksheet"""
+        self._headers[res] = list(headers)
+        self._ids[res] = [str(headers[0]) if headers else '']
+        self._rows[res] = None
+
+    def note_header_columns(self, res, names):
+        """Records columns just added to the end of an existing header row"""
+        self._headers[res] = self.headers(res) + list(names)
+
+    def note_appended(self, res, ids):
+        """Records rows appended at the bottom of the worksheet"""
+        col = self._load_ids(res)
+        rows = self._rows[res]
+        for id_val in ids:
+            col.append(str(id_val))
+            if rows is not None: rows.setdefault(str(id_val), len(col))
+
+    def note_deleted(self, res, row_numbers):
+        """Records deleted rows; later rows shift up, so the id map is rebuilt lazily"""
+        col = self._load_ids(res)
+        for r in sorted(row_numbers, reverse=True):
+            if 0 < r <= len(col): del col[r - 1]
+        self._rows[res] = None
@@ -0,0 +1,103 @@
+import threading
+import time
+
+
+class SyncScheduler:
+    """Background sync loop woken by local changes instead of a fixed sleep.
+
+    Timing comes from settings:
+    - sync_debounce (2s): quiet period after the last change before pushing
+    - sync_debounce_max (30s): longest a burst of changes can delay a push
+    - sync_min_interval (10s): minimum gap between two runs
+    - sync_frequency (300s): maximum gap between two runs, even without changes
+    - sync_retry_delay (60s): delay before retrying a failed run
+    Forced runs skip the debounce and minimum interval; a force that arrives
+    while a run is in progress is merged into that run.
+    """
+
+    def __init__(self, run, get_settings):
+        self.run = run
+        self.get_settings = get_settings
+        self.cond = threading.Condition()
+        self.running = False
+        self.force_requested = False
+        self.dirty = False
+        self.first_change = None
+        self.last_change = None
+        self.retry_at = None
+        self.last_run = None
+        self.runs = 0
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def notify(self):
+        """Called on every local change"""
+        with self.cond:
+            now = time.monotonic()
+            if not self.dirty:
+                self.dirty = True
+                self.first_change = now
+            self.last_change = now
+            self.cond.notify()
+
+    def trigger(self):
+        """Requests an immediate run. Returns True if merged into a run in progress"""
+        with self.cond:
+            if self.running:
+                return True
+            self.force_requested = True
+            self.cond.notify()
+            return False
+
+    def wake(self):
+        """Re-evaluates the schedule (e.g. after settings changed)"""
+        with self.cond:
+            self.cond.notify()
+
+    def _next_due(self, now):
+        settings = self.get_settings()
+        max_interval = max(10, settings.get("sync_frequency", 300)) # Minimum 10 seconds safety
+        min_interval = settings.get("sync_min_interval", 10)
+
+        if self.force_requested or self.last_run is None:
+            return now
+
+        due = self.last_run + max_interval
+        if self.retry_at is not None:
+            due = min(due, self.retry_at)
+        if self.dirty:
+            quiet = min(self.last_change + settings.get("sync_debounce", 2),
+                        self.first_change + settings.get("sync_debounce_max", 30))
+            due = min(due, max(quiet, self.last_run + min_interval))
+        return due
+
+    def _loop(self):
+        while True:
+            with self.cond:
+                while True:
+                    now = time.monotonic()
+                    due = self._next_due(now)
+                    if now >= due:
+                        break
+                    self.cond.wait(due - now)
+                self.running = True
+                self.force_requested = False
+                self.dirty = False
+                self.first_change = self.last_change = None
+
+            try:
+                success = self.run()
+            except Exception as e:
+                print(f"[SYNC] Scheduled run failed: {e}")
+                success = False
+
+            with self.cond:
+                self.running = False
+                self.runs += 1
+                self.last_run = time.monotonic()
+                if success:
+                    self.retry_at = None
+                else:
+                    self.retry_at = self.last_run + self.get_settings().get("sync_retry_delay", 60)
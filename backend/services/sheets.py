@@ -1,5 +1,3 @@
-import gspread
-from google.oauth2.service_account import Credentials
 import os
 from dotenv import load_dotenv
 import json
@@ -7,36 +5,77 @@ import threading
 import time
 import datetime
 import traceback
+from contextlib import contextmanager
+from gspread.utils import numericise_all, rowcol_to_a1
+from services.storage import JsonStore, RESOURCES, FILTER_FIELDS, SORT_FIELDS
+from services.sync_queue import SyncQueue
+from services.coalesce import coalesce
+from services.remote_cache import RemoteSheetCache
+from services.sheets_client import SheetsClient
+from services.scheduler import SyncScheduler
+from services.rate_limit import RateLimiter
+from services.sheets_emulator import EmulatedSpreadsheet
+from services.aggregates import VendorAggregates, WalletLedger
+from services.transaction import Transaction
+from services.changes import ChangeFeed, change_event
+from services.fingerprint import row_fingerprint
 
 # Load env variables
 load_dotenv()
 
+# Upper bound on rows sent in a single batched Sheets request
+MAX_BATCH_ROWS = 500
+
 class SheetsService:
-    def __init__(self):
+    def __init__(self, base_path=None, start_sync=True):
+        """base_path holds the local data files (default: the backend folder).
+        start_sync=False skips the background sync thread (benchmarks, scripts)."""
         self.scopes = [
             "https://www.googleapis.com/auth/spreadsheets",
             "https://www.googleapis.com/auth/drive"
         ]
-        self.base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.base_path = base_path or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         self.creds_file = os.path.join(self.base_path, 'credentials.json')
         self.local_db_file = os.path.join(self.base_path, 'local_db.json')
-        self.sync_log_file = os.path.join(self.base_path, 'diff.json')
+        self.local_db_log_file = os.path.join(self.base_path, 'local_db.log')
+        self.local_sqlite_file = os.path.join(self.base_path, 'local_db.sqlite3')
+        self.sync_log_file = os.path.join(self.base_path, 'diff.json') # Legacy queue file, migrated on load
+        self.sync_queue_dir = os.path.join(self.base_path, 'sync_queue')
         self.settings_file = os.path.join(self.base_path, 'settings.json')
-        self.local_data = {}
-        self.pending_sync = []
+        self.sync_state_file = os.path.join(self.base_path, 'sync_state.json')
+        self.emulator_file = os.path.join(self.base_path, 'emulator_sheet.json')
+        self.store = None
+        self.pending_sync = None
         self.settings = {"sync_frequency": 300} # Default 5 mins
         self.last_sync_info = {"time": None, "status": "Never"}
+        self.last_pull_stats = {}
+        self.remote_fingerprints = {} # resource -> {id: row fingerprint} as of the last pull
+        self.pushed_since_pull = set() # (resource, id) pushed by us since the last pull
+        self._pull_diff_cache = None  # (time, counts, error) of the last remote comparison, set by the sync cycle
+        self.sync_stats = {"items_pushed": 0, "remote_ops": 0, "calls_saved": 0, "metadata_fetches": 0}
+        self.versions = {res: 0 for res in RESOURCES} # Bumped on every local change and pull
+        self.version_epoch = os.urandom(4).hex()     # Keeps versions from a previous run from matching
+        self.vendor_stats = VendorAggregates()       # Debt / open bills / last activity per vendor
+        self.wallet_ledger = WalletLedger()          # Date-ordered Payments/Deposits per wallet
         self.lock = threading.RLock()
         self.sync_lock = threading.Lock()
+        self.sheets_client = SheetsClient(self.creds_file, self.scopes)
+        self.limiter = RateLimiter(lambda: self.settings) # Shared by every Sheets API call
+        self.emulator = None # EmulatedSpreadsheet when sheets_backend is "emulator"
         
-        # Load local data and settings
+        # Load settings first (storage engine options), then local data
+        self._load_settings()
+        self.changes = ChangeFeed(self.version_epoch, self.settings.get("change_feed_size", 1000)) # Served by /v1/changes
         self._load_local_db()
+        self._rebuild_aggregates()
         self._load_sync_log()
-        self._load_settings()
+        self._load_sync_state()
         
-        # Start background sync thread
-        self.sync_thread = threading.Thread(target=self._sync_worker, daemon=True)
-        self.sync_thread.start()
+        # Start background sync thread (woken by local changes)
+        self.scheduler = SyncScheduler(self._sync_cycle, lambda: self.settings)
+        if start_sync:
+            print("[SYNC] Sync worker started.")
+            self.scheduler.start()
 
     def _load_settings(self):
         if os.path.exists(self.settings_file):
@@ -53,82 +92,105 @@ class SheetsService:
     def update_settings(self, new_settings):
         self.settings.update(new_settings)
         self._save_settings()
+        self.scheduler.wake()
 
-    def _load_local_db(self):
-        if os.path.exists(self.local_db_file):
+    def _load_sync_state(self):
+        if os.path.exists(self.sync_state_file):
             try:
-                with open(self.local_db_file, 'r') as f:
-                    self.local_data = json.load(f)
+                with open(self.sync_state_file, 'r') as f:
+                    state = json.load(f)
+                self.remote_fingerprints = state.get("fingerprints", {})
             except:
-                self.local_data = {}
-        
-        # Ensure structure
-        for res in ['Vendors', 'Wallets', 'Expenses', 'Payments', 'Deposits']:
-            if res not in self.local_data: self.local_data[res] = []
+                self.remote_fingerprints = {}
 
-    def _save_local_db(self):
-        with self.lock:
-            with open(self.local_db_file, 'w') as f:
-                json.dump(self.local_data, f, indent=2)
+    def _save_sync_state(self):
+        tmp_file = self.sync_state_file + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump({"fingerprints": self.remote_fingerprints}, f)
+        os.replace(tmp_file, self.sync_state_file)
+
+    def _load_local_db(self):
+        """Opens the storage engine selected by settings['storage_engine']"""
+        engine = self.settings.get("storage_engine", "json")
+        if engine == "sqlite":
+            from services.sqlite_store import SqliteStore
+            self.store = SqliteStore(self.local_sqlite_file)
+            self.store.load()
+            self.store.migrate_from_json(self.local_db_file, self.local_db_log_file)
+        else:
+            self.store = JsonStore(
+                self.local_db_file,
+                self.local_db_log_file,
+                compact_every=self.settings.get("journal_compact_every", 1000),
+                fsync=self.settings.get("journal_fsync", True)
+            )
+            self.store.load()
+        print(f"[STORAGE] Using '{self.store.name}' storage engine.")
 
     def _load_sync_log(self):
+        self.pending_sync = SyncQueue(
+            self.sync_queue_dir,
+            segment_size=self.settings.get("sync_queue_segment_size", 1000),
+            fsync=self.settings.get("journal_fsync", True)
+        )
+        self.pending_sync.load()
+
+        # One-time import of the legacy diff.json queue: one durable batch (all
+        # or nothing after a crash), renamed only once the batch is written
         if os.path.exists(self.sync_log_file):
             try:
                 with open(self.sync_log_file, 'r') as f:
-                    self.pending_sync = json.load(f)
-            except:
-                self.pending_sync = []
-        else:
-            self.pending_sync = []
-
-    def _save_sync_log(self):
-        with self.lock:
-            with open(self.sync_log_file, 'w') as f:
-                json.dump(self.pending_sync, f, indent=2)
+                    legacy = json.load(f)
+                self.pending_sync.extend(legacy)
+                os.replace(self.sync_log_file, self.sync_log_file + '.migrated')
+                print(f"[SYNC] Migrated {len(legacy)} pending items from diff.json.")
+            except Exception as e:
+                print(f"[SYNC] Could not migrate diff.json: {e}")
 
-    def _log_change(self, action, resource, data, id_val=None):
+    def _log_changes(self, changes):
+        """Queues (action, resource, id_val, data) changes for sync as one durable batch"""
+        timestamp = datetime.datetime.now().isoformat()
         with self.lock:
-            self.pending_sync.append({
-                'timestamp': datetime.datetime.now().isoformat(),
+            for resource in {c[1] for c in changes}:
+                self.versions[resource] = self.versions.get(resource, 0) + 1
+            self.pending_sync.extend([{
+                'timestamp': timestamp,
                 'action': action, # 'create', 'update', 'delete'
                 'resource': resource,
                 'data': data,
                 'id_val': id_val
-            })
-            self._save_sync_log_unlocked()
-
-    def _save_sync_log_unlocked(self):
-        with open(self.sync_log_file, 'w') as f:
-            json.dump(self.pending_sync, f, indent=2)
-
-    def _save_sync_log(self):
-        with self.lock:
-            self._save_sync_log_unlocked()
+            } for action, resource, id_val, data in changes])
+            self.changes.publish_many([change_event(*change) for change in changes])
+        self.scheduler.notify()
+
+    def _publish_sync_status(self):
+        self.changes.publish('sync', {"last_sync": dict(self.last_sync_info), "pending_count": len(self.pending_sync)})
+
+    def version_of(self, *resources):
+        """Validator (ETag) for data built from `resources`; changes whenever any of them does"""
+        return self.version_epoch + '-' + '.'.join(str(self.versions.get(res, 0)) for res in resources)
+
+    def _sync_cycle(self):
+        """One background sync run, scheduled by SyncScheduler"""
+        # 1. Check if we need to pull initial data
+        if self.store.is_empty():
+            print("[SYNC] Local database is empty. Attempting to pull from remote...")
+            if not self.pull_from_remote(full=True):
+                print("[SYNC] Initial pull failed. Will retry later.")
+                return False
 
-    def _sync_worker(self):
-        """Background thread that pushes local changes to Google Sheets"""
-        print("[SYNC] Sync worker started.")
-        
-        while True:
-            # 1. Check if we need to pull initial data
-            is_empty = sum(len(v) for v in self.local_data.values() if isinstance(v, list)) == 0
-            if is_empty:
-                print("[SYNC] Local database is empty. Attempting to pull from remote...")
-                success = self.pull_from_remote()
-                if not success:
-                    print("[SYNC] Initial pull failed. Will retry in 1 minute.")
-                    time.sleep(60)
-                    continue
+        # 2. Push pending changes
+        pushed = self.sync_now()
 
-            # 2. Daily/Regular Push
-            self.sync_now()
-            
-            # Sync check based on user settings
-            freq = self.settings.get("sync_frequency", 300)
-            time.sleep(max(10, freq)) # Minimum 10 seconds safety
+        # 3. Refresh the pending-pull counts served by get_diff()
+        self._refresh_pull_counts()
+        return pushed
 
     def _connect(self):
         """Helper to establish GSheets connection with credentials"""
+        if self.settings.get("sheets_backend") == "emulator":
+            return self._emulator_sheet()
+
         try:
             if not os.path.exists(self.creds_file):
                 err = f"Credentials file not found at {self.creds_file}"
@@ -137,9 +199,6 @@ class SheetsService:
                 self.last_sync_info["details"] = err
                 return None
             
-            creds = Credentials.from_service_account_file(self.creds_file, scopes=self.scopes)
-            client = gspread.authorize(creds)
-            
             # Use ID from .env for reliability
             sheet_id = os.getenv('SPREADSHEET_ID')
             if not sheet_id:
@@ -149,14 +208,31 @@ class SheetsService:
                 self.last_sync_info["details"] = err
                 return None
 
-            return client.open_by_key(sheet_id)
+            # Reuses the authorized client/session across cycles
+            return self.limiter.call(self.sheets_client.spreadsheet, sheet_id)
         except Exception as e:
+            self.sheets_client.handle_error(e)
             err = str(e)
             print(f"[SYNC] Connection Error: {err}")
             self.last_sync_info["status"] = "Error"
             self.last_sync_info["details"] = err
             return None
 
+    def _emulator_sheet(self):
+        """Local Sheets emulator, configured from the emulator_* settings"""
+        if self.emulator is None:
+            state_file = self.emulator_file if self.settings.get("emulator_persist", True) else None
+            self.emulator = EmulatedSpreadsheet(RESOURCES, state_file=state_file,
+                                                seed=self.settings.get("emulator_seed"))
+            print("[SYNC] Using local Sheets emulator.")
+
+        # Injection settings can change at runtime
+        self.emulator.latency_ms = self.settings.get("emulator_latency_ms", 0)
+        self.emulator.jitter_ms = self.settings.get("emulator_jitter_ms", 0)
+        self.emulator.quota_per_minute = self.settings.get("emulator_quota_per_minute")
+        self.emulator.failure_rate = self.settings.get("emulator_failure_rate", 0)
+        return self.emulator
+
     def sync_now(self):
         """Trigger an immediate sync of pending changes"""
         # Prevent concurrent syncs
@@ -172,28 +248,17 @@ class SheetsService:
             try:
                 sheet = self._connect()
                 if sheet:
-                    while True:
-                        with self.lock:
-                            if not self.pending_sync:
-                                break
-                            item = self.pending_sync[0]
-                        
-                        success = self._apply_to_remote(sheet, item)
-                        if success:
-                            with self.lock:
-                                self.pending_sync.pop(0)
-                                self._save_sync_log_unlocked()
-                        else:
-                            break # Stop and retry later if remote fails
+                    pushed, saved, complete = self._push_pending(sheet)
                     
-                    print(f"[SYNC] Push successful: {len(self.pending_sync)} items synced.")
+                    print(f"[SYNC] Push {'successful' if complete else 'incomplete'}: {pushed} items synced, {saved} API calls saved by coalescing.")
                     self.last_sync_info = {
                         "time": datetime.datetime.now().isoformat(),
-                        "status": "Success",
-                        "details": "Changes pushed"
+                        "status": "Success" if complete else "Failed",
+                        "details": f"Changes pushed ({pushed} items, {saved} calls saved)" if complete
+                                   else f"Push stopped after {pushed} items. Will retry later."
                     }
                     print("[SYNC] Sync cycle completed.")
-                    return True
+                    return complete
                 else:
                     self.last_sync_info["status"] = "Failed"
                     self.last_sync_info["details"] = "Connection failed during push"
@@ -204,34 +269,106 @@ class SheetsService:
                 self.last_sync_info["details"] = str(e)
                 print(f"[SYNC] Error during sync push: {str(e)}")
                 return False
+            finally:
+                self._publish_sync_status()
         finally:
             self.sync_lock.release()
 
-    def _save_local_db_unlocked(self):
-        with open(self.local_db_file, 'w') as f:
-            json.dump(self.local_data, f, indent=2)
+    def _push_pending(self, sheet):
+        """Pushes the queue in coalesced batches. Returns (items pushed, calls saved, complete)"""
+        cache = RemoteSheetCache(sheet, self.limiter.call)
+        try:
+            return self._push_batches(cache)
+        finally:
+            self.sync_stats["metadata_fetches"] += cache.fetches
+
+    def _push_batches(self, cache):
+        batch_size = self.settings.get("sync_batch_size", 500)
+        pushed, saved = 0, 0
+        while True:
+            with self.lock:
+                plan = self.pending_sync.plan
+                if plan is None:
+                    items = self.pending_sync.peek(batch_size)
+                    if not items:
+                        return pushed, saved, True
+                    ops, batch_saved = coalesce(items)
+                    plan = self.pending_sync.stage(ops, len(items))
+                    saved += batch_saved
+                    self.sync_stats["calls_saved"] += batch_saved
+
+            # Resume from the first op not yet applied
+            ops = plan['ops']
+            batch_push = self.settings.get("sync_batch_push", True)
+            while plan['done'] < len(ops):
+                if batch_push:
+                    group = self._next_group(ops, plan['done'])
+                    success = self._apply_batch_to_remote(cache, group)
+                else:
+                    group = [ops[plan['done']]]
+                    success = self._apply_to_remote(cache, group[0])
+                if not success:
+                    return pushed, saved, False # Stop and retry later if remote fails
+                self.sync_stats["remote_ops"] += len(group)
+                with self.lock:
+                    self.pending_sync.mark_done(plan['done'] + len(group))
+
+            with self.lock:
+                self.pending_sync.commit_plan()
+                self.pushed_since_pull.update(self._pending_keys(ops))
+            pushed += plan['count']
+            self.sync_stats["items_pushed"] += plan['count']
 
-    def _fetch_remote_data(self, sheet=None):
-        """Internal helper to pull all records from GSheets without saving"""
+    def _fetch_remote_data(self, sheet=None, record_stats=True):
+        """Internal helper to pull all records from GSheets without saving.
+
+        All five worksheets are read with a single values_batch_get request.
+        Returns (data, error); a missing or unreadable sheet is an error.
+        record_stats=False leaves last_pull_stats (shown by /v1/sync/status) alone.
+        """
         try:
             if not sheet: sheet = self._connect()
-            if not sheet: return None
-            
+            if not sheet: return None, self.last_sync_info.get("details", "Connection failed")
+
+            start = time.perf_counter()
+            result = self.limiter.call(sheet.values_batch_get, [f"'{res}'" for res in RESOURCES])
+            fetch_ms = (time.perf_counter() - start) * 1000
+
+            value_ranges = result.get('valueRanges', [])
+            if len(value_ranges) != len(RESOURCES):
+                return None, f"Expected {len(RESOURCES)} sheets, got {len(value_ranges)}"
+
             data = {}
-            for res in ['Vendors', 'Wallets', 'Expenses', 'Payments', 'Deposits']:
-                try:
-                    ws = sheet.worksheet(res)
-                    data[res] = ws.get_all_records()
-                except:
-                    data[res] = []
-            return data
-        except:
-            return None
+            stats = {"fetch_ms": round(fetch_ms, 1), "sheets": {}}
+            for res, value_range in zip(RESOURCES, value_ranges):
+                start = time.perf_counter()
+                data[res] = self._to_records(value_range.get('values', []))
+                stats["sheets"][res] = {
+                    "rows": len(data[res]),
+                    "parse_ms": round((time.perf_counter() - start) * 1000, 1)
+                }
+            stats["total_ms"] = round(fetch_ms + sum(v["parse_ms"] for v in stats["sheets"].values()), 1)
+            if record_stats: self.last_pull_stats = stats
+            print(f"[SYNC] Pulled {sum(len(v) for v in data.values())} rows in {stats['total_ms']} ms (fetch {stats['fetch_ms']} ms).")
+            return data, None
+        except Exception as e:
+            self.sheets_client.handle_error(e)
+            return None, f"Pull failed: {e}"
+
+    def _to_records(self, values):
+        """Same shape as gspread's get_all_records(): header row as keys, numericised cells"""
+        if not values or not values[0]:
+            return []
+        headers = values[0]
+        width = len(headers)
+        records = []
+        for row in values[1:]:
+            row = list(row[:width]) + [''] * (width - len(row))
+            records.append(dict(zip(headers, numericise_all(row))))
+        return records
 
     def get_diff(self):
-        """Calculates differences based on local diff.json only"""
-        # Local-First optimization: No remote fetch
-        
+        """Pending pushes from the local queue; pending pulls as last counted by the sync cycle"""
         diff = {
             "pending_push": 0,
             "pending_pull": 0,
@@ -255,51 +392,177 @@ class SheetsService:
             res = item['resource']
             if res in diff["details"]:
                 diff["details"][res]["push"] += 1
+
+        # Pulls: never fetched here, so the request cannot wait on the Sheets API
+        cached = self._pull_diff_cache
+        if cached:
+            checked, counts, error = cached
+            diff["pull_checked"] = datetime.datetime.fromtimestamp(checked).isoformat()
+            if counts is not None:
+                for res, count in counts.items():
+                    diff["details"][res]["pull"] = count
+                diff["pending_pull"] = sum(counts.values())
+            else:
+                diff["pull_error"] = error
                 
         return diff, None
 
-    def full_sync(self):
-        """Manual Push operation (Local-First)"""
-        print("[SYNC] Manually Triggered: Starting Push Sync...")
-        # 1. Push all pending changes
-        push_success = self.sync_now()
-        
-        if push_success:
-            print("[SYNC] Manual Push Sync: SUCCESS.")
-        else:
-            print(f"[SYNC] Manual Push Sync: COMPLETED WITH ISSUES (Push: {'OK' if push_success else 'FAIL'})")
-        
-        return self.last_sync_info
+    def _refresh_pull_counts(self):
+        """Counts remote inserts/updates/deletes per resource since the last pull.
+
+        Off unless `diff_remote` is set: the Sheets API has no row or range
+        checksums, so counting means downloading every row (as much read quota
+        as a pull). When on, runs on the sync thread at most every
+        `diff_remote_ttl` seconds and compares each downloaded row's
+        fingerprint with the one saved at the last pull. Rows pushed by us
+        since then are not counted.
+        """
+        if not self.settings.get("diff_remote", False) or not self.remote_fingerprints:
+            return
+        cached = self._pull_diff_cache
+        if cached and time.time() - cached[0] < self.settings.get("diff_remote_ttl", 300):
+            return
+        if not self.sync_lock.acquire(blocking=False):
+            return # A push or pull is running; count next cycle
+
+        try:
+            data, error = self._fetch_remote_data(record_stats=False)
+            if data is None:
+                self._pull_diff_cache = (time.time(), None, error)
+                return
+
+            current = {res: {str(r.get('id')): row_fingerprint(r) for r in data.get(res, [])} for res in RESOURCES}
+            counts = {}
+            with self.lock:
+                for res in RESOURCES:
+                    previous = self.remote_fingerprints.get(res, {})
+                    changed = [k for k, fp in current[res].items() if previous.get(k) != fp]
+                    changed += [k for k in previous if k not in current[res]]
+                    counts[res] = sum(1 for k in changed if (res, k) not in self.pushed_since_pull)
+            self._pull_diff_cache = (time.time(), counts, None)
+        finally:
+            self.sync_lock.release()
 
-    def pull_from_remote(self):
-        """Fetch all data from Google Sheets to populate local cache"""
+    def pull_from_remote(self, full=False):
+        """Fetch data from Google Sheets into the local cache.
+
+        By default only rows whose fingerprint changed since the last pull are
+        applied, and records with unpushed local changes are left alone. The
+        first pull, a pull into an empty local cache (wiped or new storage
+        engine: the saved fingerprints no longer describe it) or full=True
+        replaces the local cache entirely.
+        """
         if not self.sync_lock.acquire(blocking=False):
              print("[SYNC] Sync/Pull already in progress. Skipping pull.")
              return False
 
         try:
             print("[SYNC] Connecting for remote pull...")
-            data = self._fetch_remote_data()
-            if data:
+            data, error = self._fetch_remote_data()
+            if data is not None:
                 with self.lock:
-                    self.local_data = data
-                    self._save_local_db_unlocked()
-                
+                    incremental = (not full and bool(self.remote_fingerprints) and not self.store.is_empty()
+                                   and self.settings.get("incremental_pull", True))
+                    if incremental:
+                        queued, mark = list(self.pending_sync), self.pending_sync.next_seq
+                # Fingerprinting and diffing need no lock: only this thread (holding sync_lock) changes them
+                if incremental:
+                    stats = self._merge_remote(data, queued, mark)
+                    details = (f"Incremental pull complete: {stats['inserted']} inserted, {stats['updated']} updated, "
+                               f"{stats['deleted']} deleted, {stats['skipped_pending']} kept (pending push)")
+                else:
+                    fingerprints = {
+                        res: {str(r.get('id')): row_fingerprint(r) for r in data.get(res, [])} for res in RESOURCES
+                    }
+                    with self.lock:
+                        self.store.replace_all(data)
+                        self.changes.publish('reset', {"reason": "pull"}) # Too many to list: clients reload
+                        self._rebuild_aggregates()
+                        for res in RESOURCES:
+                            self.versions[res] += 1
+                    self.remote_fingerprints = fingerprints
+                    details = "Full pull complete"
+                self.pushed_since_pull = set()
+                self._pull_diff_cache = (time.time(), {res: 0 for res in RESOURCES}, None) # In step with the cloud
+                self._save_sync_state()
+
                 self.last_sync_info = {
                     "time": datetime.datetime.now().isoformat(),
                     "status": "Success",
-                    "details": "Full pull complete"
+                    "details": details
                 }
-                print("[SYNC] Full pull complete.")
+                print(f"[SYNC] {details}.")
                 return True
             else:
                 self.last_sync_info["status"] = "Failed"
-                self.last_sync_info["details"] = "Connection failed for pull"
+                self.last_sync_info["details"] = error or "Connection failed for pull"
+                print(f"[SYNC] {error}")
                 return False
         finally:
+            self._publish_sync_status()
             self.sync_lock.release()
 
-    def _apply_to_remote(self, sheet, item):
+    def _pending_keys(self, items=None):
+        """(resource, id) of every record with a change still waiting to be pushed"""
+        keys = set()
+        for item in (self.pending_sync if items is None else items):
+            if item['action'] == 'create':
+                keys.add((item['resource'], str((item.get('data') or {}).get('id'))))
+            else:
+                keys.add((item['resource'], str(item.get('id_val'))))
+        return keys
+
+    def _merge_remote(self, data, queued, mark):
+        """Applies only remote inserts/updates/deletes since the last pull.
+
+        Rows are compared with the last pull's fingerprints without holding
+        self.lock; only applying the changed ones takes it. `queued` is the
+        sync queue as the pull started and `mark` its next seq: records with
+        changes waiting to be pushed, then or since, are left alone.
+        """
+        pending = self._pending_keys(queued)
+        candidates = [] # (resource, id, remote row or None if deleted remotely), in sheet order
+        fingerprints = {}
+        for res in RESOURCES:
+            previous = self.remote_fingerprints.get(res, {})
+            current = fingerprints[res] = {}
+            for record in data.get(res, []):
+                id_key = str(record.get('id'))
+                fp = row_fingerprint(record)
+                current[id_key] = fp
+                if previous.get(id_key) != fp:
+                    candidates.append((res, id_key, record))
+            # Rows that disappeared remotely since the last pull
+            candidates.extend((res, id_key, None) for id_key in previous.keys() - current.keys())
+
+        stats = {"inserted": 0, "updated": 0, "deleted": 0, "skipped_pending": 0}
+        with self.lock:
+            pending |= self._pending_keys(self.pending_sync.since(mark)) # Queued while comparing
+            changes = [] # Applied with one store write
+            created = set()
+            for res, id_key, record in candidates:
+                if (res, id_key) in pending:
+                    stats["skipped_pending"] += 1
+                elif record is None:
+                    if self.store.get(res, id_key) is not None:
+                        changes.append(('delete', res, id_key, None))
+                        stats["deleted"] += 1
+                elif (res, id_key) not in created and self.store.get(res, id_key) is None:
+                    changes.append(('create', res, None, record))
+                    created.add((res, id_key)) # A duplicate row later in the sheet updates it
+                    stats["inserted"] += 1
+                else:
+                    changes.append(('update', res, id_key, record))
+                    stats["updated"] += 1
+            if changes:
+                self._apply_changes(changes)
+                self.changes.publish_many([change_event(*change) for change in changes])
+                for res in {c[1] for c in changes}:
+                    self.versions[res] += 1
+        self.remote_fingerprints = fingerprints
+        return stats
+
+    def _apply_to_remote(self, cache, item):
         """Applies a single logged change to the remote Google Sheet"""
         try:
             res = item['resource']
@@ -307,98 +570,294 @@ class SheetsService:
             data = item['data']
             id_val = item['id_val']
             
-            ws = sheet.worksheet(res)
+            ws = cache.worksheet(res)
+            call, call_once = self.limiter.call, self.limiter.call_once
             
             if action == 'create':
-                headers = ws.row_values(1)
-                if not headers:
-                    headers = list(data.keys())
-                    ws.append_row(headers)
-                
-                # Ensure all lists/dicts are strings for Sheets
-                row_data = {}
-                for k, v in data.items():
-                    if isinstance(v, (list, dict)):
-                        row_data[k] = json.dumps(v)
-                    else:
-                        row_data[k] = v
+                headers = self._ensure_headers(cache, res, [data])
+
+                # Already there (e.g. replayed after a crash): overwrite instead of duplicating
+                row_idx = cache.row_of(res, data.get('id'))
+                if row_idx:
+                    call(ws.update, f"A{row_idx}", [self._to_row(data, headers)])
+                    return True
                 
-                row = [row_data.get(h, '') for h in headers]
-                ws.append_row(row)
+                call_once(ws.append_row, self._to_row(data, headers))
+                cache.note_appended(res, [data.get('id')])
                 return True
                 
             elif action == 'update':
-                col_values = ws.col_values(1)
-                try:
-                    row_idx = col_values.index(str(id_val)) + 1
-                    headers = ws.row_values(1)
-                    
-                    # Ensure all lists/dicts are strings for Sheets
-                    row_data = {}
-                    for k, v in data.items():
-                        if isinstance(v, (list, dict)):
-                            row_data[k] = json.dumps(v)
-                        else:
-                            row_data[k] = v
-                            
-                    new_row = [row_data.get(h, '') for h in headers]
-                    ws.update(f"A{row_idx}", [new_row])
-                    return True
-                except ValueError:
-                    return True 
+                row_idx = cache.row_of(res, id_val)
+                if row_idx:
+                    call(ws.update, f"A{row_idx}", [self._to_row(data, self._ensure_headers(cache, res, [data]))])
+                return True
                     
             elif action == 'delete':
-                col_values = ws.col_values(1)
-                try:
-                    row_idx = col_values.index(str(id_val)) + 1
-                    ws.delete_rows(row_idx)
-                    return True
-                except ValueError:
-                    return True
+                row_idx = cache.row_of(res, id_val)
+                if row_idx:
+                    call_once(ws.delete_rows, row_idx)
+                    cache.note_deleted(res, [row_idx])
+                return True
                     
             return False
         except Exception as e:
+            self.sheets_client.handle_error(e)
             print(f"[SYNC] Worker failed on item: {str(e)}")
             return False
 
+    def _next_group(self, ops, start):
+        """Consecutive ops from `start` with the same worksheet and action"""
+        first = ops[start]
+        end = start + 1
+        while (end < len(ops) and end - start < MAX_BATCH_ROWS
+               and ops[end]['resource'] == first['resource']
+               and ops[end]['action'] == first['action']):
+            end += 1
+        return ops[start:end]
+
+    def _ensure_headers(self, cache, res, records):
+        """Header row of `res`, first adding a column for any field of `records` it lacks.
+
+        _to_row() drops fields without a column, so they would be lost on the
+        next pull (e.g. the `created` stamp that orders the wallet ledger).
+        An empty worksheet gets the first record's fields as its header row.
+        """
+        headers = cache.headers(res)
+        missing = []
+        for data in records:
+            missing.extend(k for k in data if k not in headers and k not in missing)
+        if not missing: return headers
+
+        ws = cache.worksheet(res)
+        call, call_once = self.limiter.call, self.limiter.call_once
+        if not headers:
+            call_once(ws.append_row, missing)
+            cache.note_headers(res, missing)
+            return missing
+        width = len(headers) + len(missing)
+        if width > ws.col_count:
+            call_once(ws.add_cols, width - ws.col_count) # Writes past the grid are rejected
+        call(ws.update, rowcol_to_a1(1, len(headers) + 1), [missing])
+        cache.note_header_columns(res, missing)
+        print(f"[SYNC] Added column(s) {', '.join(missing)} to {res}")
+        return cache.headers(res)
+
+    def _to_row(self, data, headers):
+        """Orders a record by headers, ensuring all lists/dicts are strings for Sheets"""
+        row_data = {}
+        for k, v in data.items():
+            if isinstance(v, (list, dict)):
+                row_data[k] = json.dumps(v)
+            else:
+                row_data[k] = v
+        return [row_data.get(h, '') for h in headers]
+
+    def _apply_batch_to_remote(self, cache, group):
+        """Applies a group of same-worksheet, same-action changes with one write request"""
+        try:
+            res = group[0]['resource']
+            action = group[0]['action']
+            ws = cache.worksheet(res)
+            call, call_once = self.limiter.call, self.limiter.call_once
+
+            if action == 'create':
+                headers = self._ensure_headers(cache, res, [item['data'] for item in group])
+
+                # Rows already present (e.g. replayed after a crash) are overwritten instead
+                new_items, existing = [], []
+                for item in group:
+                    row_idx = cache.row_of(res, item['data'].get('id'))
+                    if row_idx:
+                        existing.append({'range': f"A{row_idx}", 'values': [self._to_row(item['data'], headers)]})
+                    else:
+                        new_items.append(item)
+                if existing:
+                    call(ws.batch_update, existing)
+                if new_items:
+                    call_once(ws.append_rows, [self._to_row(item['data'], headers) for item in new_items])
+                    cache.note_appended(res, [item['data'].get('id') for item in new_items])
+                return True
+
+            elif action == 'update':
+                headers = self._ensure_headers(cache, res, [item['data'] for item in group])
+                updates = []
+                for item in group:
+                    row_idx = cache.row_of(res, item['id_val'])
+                    if row_idx: # Missing rows are skipped, as in single mode
+                        updates.append({'range': f"A{row_idx}", 'values': [self._to_row(item['data'], headers)]})
+                if updates:
+                    call(ws.batch_update, updates)
+                return True
+
+            elif action == 'delete':
+                rows = {cache.row_of(res, item['id_val']) for item in group} - {None}
+                # Bottom row first so earlier deletes don't shift later ones
+                requests = [{
+                    'deleteDimension': {
+                        'range': {'sheetId': ws.id, 'dimension': 'ROWS', 'startIndex': r - 1, 'endIndex': r}
+                    }
+                } for r in sorted(rows, reverse=True)]
+                if requests:
+                    call_once(cache.sheet.batch_update, {'requests': requests})
+                    cache.note_deleted(res, rows)
+                return True
+
+            return False
+        except Exception as e:
+            self.sheets_client.handle_error(e)
+            print(f"[SYNC] Worker failed on batch of {len(group)} items: {str(e)}")
+            return False
+
     # --- CRUD Operations (NOW ALWAYS LOCAL) ---
 
     def get_all(self, resource):
-        return self.local_data.get(resource, [])
+        return self.store.all(resource)
 
     def get_by_id(self, resource, id_val):
-        records = self.get_all(resource)
-        for r in records:
-            if str(r.get('id')) == str(id_val): return r
-        return None
+        return self.store.get(resource, id_val)
+
+    def get_related(self, resource, field, value):
+        """Records of `resource` referencing `value` via a foreign key (e.g. Expenses by vendorId)"""
+        return self.store.find(resource, field, value)
+
+    def query(self, resource, filters=None, date_from=None, date_to=None, sort=None, limit=None, cursor=None):
+        """Filtered, sorted page of records from the store's indexes. Returns (records, next_cursor).
+
+        `sort` is a field name, prefixed with '-' for descending order. Raises
+        ValueError for filters or sort fields the resource has no index for.
+        """
+        filters = filters or {}
+        if not (filters or date_from or date_to or sort or limit is not None or cursor):
+            return self.get_all(resource), None
+
+        for field in filters:
+            if field not in FILTER_FIELDS.get(resource, []):
+                raise ValueError(f"Cannot filter {resource} by '{field}'")
+        if (date_from or date_to) and 'date' not in SORT_FIELDS.get(resource, []):
+            raise ValueError(f"{resource} have no date to filter by")
+
+        descending = False
+        if sort:
+            descending = sort.startswith('-')
+            sort = sort.lstrip('-+')
+            if sort not in SORT_FIELDS.get(resource, []):
+                raise ValueError(f"Cannot sort {resource} by '{sort}'. Use one of: {', '.join(SORT_FIELDS.get(resource, []))}")
 
-    def create(self, resource, data):
         with self.lock:
-            if resource not in self.local_data: self.local_data[resource] = []
-            self.local_data[resource].append(data)
-            self._save_local_db_unlocked()
-            self._log_change('create', resource, data)
+            return self.store.query(resource, filters, date_from, date_to, sort or None, descending, limit, cursor)
+
+    def iter_pages(self, resource, filters=None, date_from=None, date_to=None, sort=None, page_size=500):
+        """Yields a resource's matching records one page at a time.
+
+        Each page is a separate keyset query, so the lock is only held while
+        a page is read, never for the whole iteration. Records changed between
+        pages may show their old or new version, but none is skipped or
+        repeated. Validates like query() before yielding the first page.
+        """
+        cursor = None
+        while True:
+            records, cursor = self.query(resource, filters, date_from, date_to, sort, page_size, cursor)
+            if records:
+                yield records
+            if not cursor:
+                return
+
+    def _rebuild_aggregates(self):
+        for agg in (self.vendor_stats, self.wallet_ledger):
+            agg.rebuild(self.store)
+
+    def _update_aggregates(self, resource, old, new):
+        """Moves the materialized aggregates from `old` to `new` (either may be None)"""
+        for agg in (self.vendor_stats, self.wallet_ledger):
+            if old: agg.remove(resource, old)
+            if new: agg.add(resource, new)
+
+    def wallet_history(self, wallet_id, limit, cursor=None):
+        """One page of a wallet's Payments and Deposits, newest first, each with the
+        wallet balance after it. Returns (entries, next_cursor), or None if the wallet does not exist."""
+        with self.lock:
+            wallet = self.store.get('Wallets', wallet_id)
+            if not wallet: return None
+            try:
+                balance = float(wallet.get('balance') or 0)
+            except:
+                balance = 0
+            rows, next_cursor = self.wallet_ledger.page(wallet_id, balance, limit, cursor)
+            history = []
+            for resource, id_key, _, after in rows:
+                record = self.store.get(resource, id_key) or {'id': id_key}
+                history.append({**record, 'type': 'payment' if resource == 'Payments' else 'deposit', 'balance': after})
+            return history, next_cursor
+
+    def vendor_summary(self):
+        """Every vendor with its outstanding balance, open bill count and last activity date"""
+        with self.lock:
+            return [{**v, **self.vendor_stats.get(v.get('id'))} for v in self.store.all('Vendors')]
+
+    @contextmanager
+    def transaction(self):
+        """Yields a Transaction whose staged changes are committed as one unit.
+
+        The block runs under self.lock, so checks made through the transaction
+        cannot race other writers. On exit the changes are applied with one
+        durable store write and queued for sync as one batch; if the block
+        raises, nothing is written.
+        """
+        with self.lock:
+            txn = Transaction(self.store)
+            yield txn
+            self._commit(txn)
+
+    def _commit(self, txn):
+        if not txn.changes: return
+        # Queue first: after a crash between the two writes, a queued change that
+        # never reached the store is pushed and comes back with the next pull; a
+        # stored change that was never queued would never be pushed
+        self._log_changes(txn.changes)
+        self._apply_changes(txn.changes)
+
+    def _apply_changes(self, changes):
+        """Applies changes with one store write and moves the aggregates along. Caller must hold self.lock"""
+        # Previous version of each record, for the aggregates
+        latest, previous = {}, []
+        for action, resource, id_val, record in changes:
+            key = (resource, str(record.get('id') if action == 'create' else id_val))
+            if key in latest:
+                previous.append(latest[key])
+            else:
+                previous.append(None if action == 'create' else self.store.get(resource, id_val))
+            latest[key] = record
+
+        self.store.apply(changes)
+        for (_, resource, _, record), old in zip(changes, previous):
+            self._update_aggregates(resource, old, record)
+
+    def create(self, resource, data):
+        with self.transaction() as txn:
+            txn.create(resource, data)
         return data
 
+    def create_many(self, resource, records):
+        """Inserts records as one transaction: one storage write and one sync queue write"""
+        with self.transaction() as txn:
+            for record in records:
+                txn.create(resource, record)
+        return records
+
     def update(self, resource, id_val, updates):
-        with self.lock:
-            records = self.local_data.get(resource, [])
-            for i, r in enumerate(records):
-                if str(r.get('id')) == str(id_val):
-                    records[i] = {**r, **updates}
-                    self._save_local_db_unlocked()
-                    self._log_change('update', resource, records[i], id_val)
-                    return records[i]
-        return None
-
-    def _revert_transaction(self, resource, id_val):
-        """Reverts the financial impact of a transaction before deletion"""
+        with self.transaction() as txn:
+            record = txn.update(resource, id_val, updates)
+        return record
+
+    def _revert_transaction(self, txn, resource, id_val):
+        """Stages the reversal of a transaction's financial impact before deletion.
+        Errors propagate, so a partial reversal aborts the delete with it"""
         # Only relevant for financial transactions
         if resource not in ['Payments', 'Deposits']:
             return
 
         # We must find the record to know the amount and wallet
-        item = self.get_by_id(resource, id_val)
+        item = txn.get(resource, id_val)
         if not item: return
 
         wallet_id = item.get('walletId')
@@ -409,170 +868,143 @@ class SheetsService:
 
         if not wallet_id: return
 
-        wallet = self.get_by_id('Wallets', wallet_id)
+        wallet = txn.get('Wallets', wallet_id)
         if not wallet: return # Wallet deleted? Can't revert.
 
-        try:
-            current_balance = float(wallet.get('balance', 0))
+        current_balance = float(wallet.get('balance', 0))
+        
+        new_balance = current_balance
+        if resource == 'Payments':
+            # Payment decreased balance, so add it back
+            new_balance += amount
+        elif resource == 'Deposits':
+            # Deposit increased balance, so remove it
+            new_balance -= amount
             
-            new_balance = current_balance
-            if resource == 'Payments':
-                # Payment decreased balance, so add it back
-                new_balance += amount
-            elif resource == 'Deposits':
-                # Deposit increased balance, so remove it
-                new_balance -= amount
-                
-            # Log the wallet update (Recursively uses RLock)
-            self.update('Wallets', wallet_id, {'balance': new_balance})
-            print(f"[LOGIC] Reverted {resource} {id_val}: Wallet {wallet_id} balance adjusted to {new_balance}")
-
-            # Revert Expense Balances (if Payment)
-            if resource == 'Payments':
-                refs = item.get('refs', [])
-                if isinstance(refs, str):
-                    try: refs = json.loads(refs)
-                    except: refs = []
-                
-                for r in refs:
-                    if isinstance(r, dict) and 'id' in r and 'amount' in r:
-                        exp_id = r['id']
-                        alloc_amt = float(r['amount'])
-                        
-                        exp = self.get_by_id('Expenses', exp_id)
-                        if exp:
-                             # Restore balance
-                             cur_exp_bal = float(exp.get('balance', 0))
-                             restored_bal = cur_exp_bal + alloc_amt
-                             
-                             # Restore Status (Simplistic logic: if bal > 0, it's Partial or Open)
-                             # Since we don't know the Original Amount easily without parsing 'amount' field which is total cost
-                             # We'll just set to 'Partial' if not fully unpaid? 
-                             # Actually usually 'Open' or 'Pending'. Let's check Expense fields.
-                             # Assuming 'amount' is total cost.
-                             total_cost = float(exp.get('amount', 0))
-                             status = 'Partial'
-                             if restored_bal >= total_cost - 0.01: status = 'Pending' # Using Pending/Unpaid convention
-                             
-                             self.update('Expenses', exp_id, {'balance': restored_bal, 'status': status})
-                             print(f"[LOGIC] Reverted Expense {exp_id}: Balance += {alloc_amt}")
-        except Exception as e:
-            print(f"[ERROR] Failed to revert transaction {id_val}: {e}")
+        # Staged; committed together with the deletion
+        txn.update('Wallets', wallet_id, {'balance': new_balance})
+        print(f"[LOGIC] Reverted {resource} {id_val}: Wallet {wallet_id} balance adjusted to {new_balance}")
+
+        # Revert Expense Balances (if Payment)
+        if resource == 'Payments':
+            refs = item.get('refs', [])
+            if isinstance(refs, str):
+                try: refs = json.loads(refs)
+                except: refs = []
+            
+            for r in refs:
+                if isinstance(r, dict) and 'id' in r and 'amount' in r:
+                    exp_id = r['id']
+                    alloc_amt = float(r['amount'])
+                    
+                    exp = txn.get('Expenses', exp_id)
+                    if exp:
+                         # Restore balance
+                         cur_exp_bal = float(exp.get('balance', 0))
+                         restored_bal = cur_exp_bal + alloc_amt
+                         
+                         # Restore Status (Simplistic logic: if bal > 0, it's Partial or Open)
+                         # Since we don't know the Original Amount easily without parsing 'amount' field which is total cost
+                         # We'll just set to 'Partial' if not fully unpaid? 
+                         # Actually usually 'Open' or 'Pending'. Let's check Expense fields.
+                         # Assuming 'amount' is total cost.
+                         total_cost = float(exp.get('amount', 0))
+                         status = 'Partial'
+                         if restored_bal >= total_cost - 0.01: status = 'Pending' # Using Pending/Unpaid convention
+                         
+                         txn.update('Expenses', exp_id, {'balance': restored_bal, 'status': status})
+                         print(f"[LOGIC] Reverted Expense {exp_id}: Balance += {alloc_amt}")
 
     def _check_dependencies(self, resource, id_val):
         """Checks if the record is referenced by others. Raises Exception if so."""
-        id_str = str(id_val)
-        
         if resource == 'Wallets':
-            for p in self.local_data.get('Payments', []):
-                if str(p.get('walletId')) == id_str:
-                    raise Exception(f"Cannot delete Wallet. Used in Payment {p['id']}")
-            for d in self.local_data.get('Deposits', []):
-                if str(d.get('walletId')) == id_str:
-                    raise Exception(f"Cannot delete Wallet. Used in Deposit {d['id']}")
+            p = self.store.first('Payments', 'walletId', id_val)
+            if p: raise Exception(f"Cannot delete Wallet. Used in Payment {p['id']}")
+            d = self.store.first('Deposits', 'walletId', id_val)
+            if d: raise Exception(f"Cannot delete Wallet. Used in Deposit {d['id']}")
 
         elif resource == 'Vendors':
-            for e in self.local_data.get('Expenses', []):
-                if str(e.get('vendorId')) == id_str:
-                    raise Exception(f"Cannot delete Vendor. Has link to Expense {e['id']}")
-            for p in self.local_data.get('Payments', []):
-                if str(p.get('vendorId')) == id_str:
-                    raise Exception(f"Cannot delete Vendor. Has link to Payment {p['id']}")
-            for d in self.local_data.get('Deposits', []):
-                if str(d.get('vendorId')) == id_str:
-                    raise Exception(f"Cannot delete Vendor. Has link to Deposit {d['id']}")
+            e = self.store.first('Expenses', 'vendorId', id_val)
+            if e: raise Exception(f"Cannot delete Vendor. Has link to Expense {e['id']}")
+            p = self.store.first('Payments', 'vendorId', id_val)
+            if p: raise Exception(f"Cannot delete Vendor. Has link to Payment {p['id']}")
+            d = self.store.first('Deposits', 'vendorId', id_val)
+            if d: raise Exception(f"Cannot delete Vendor. Has link to Deposit {d['id']}")
 
         elif resource == 'Expenses':
-            for p in self.local_data.get('Payments', []):
-                refs = p.get('refs', [])
-                # Handle potential string format from legacy/remote data
-                if isinstance(refs, str):
-                    try: refs = json.loads(refs)
-                    except: refs = []
-                    
-                # Legacy ref was list of IDs; New ref is list of {id, amount}
-                ref_ids = []
-                for r in refs:
-                    if isinstance(r, dict): ref_ids.append(str(r.get('id')))
-                    else: ref_ids.append(str(r))
-
-                if id_str in ref_ids:
-                     raise Exception(f"Cannot delete Expense. It is part of Payment {p['id']}")
+            p = self.store.first('Payments', 'refs', id_val)
+            if p: raise Exception(f"Cannot delete Expense. It is part of Payment {p['id']}")
 
     def delete(self, resource, id_val):
-        with self.lock:
-            # 1. Validation: Check for dependencies
+        with self.transaction() as txn:
             # 1. Validation: Check for dependencies
             self._check_dependencies(resource, id_val)
 
             # 2. Revert financial impact
-            self._revert_transaction(resource, id_val)
-
-            # 3. Proceed with deletion
-            records = self.local_data.get(resource, [])
-            initial_len = len(records)
-            self.local_data[resource] = [r for r in records if str(r.get('id')) != str(id_val)]
-            if len(self.local_data[resource]) < initial_len:
-                self._save_local_db_unlocked()
-                self._log_change('delete', resource, None, id_val)
-                return True
-        return False
+            self._revert_transaction(txn, resource, id_val)
+
+            # 3. Proceed with deletion (committed with the reversal, or not at all)
+            deleted = txn.delete(resource, id_val)
+        return deleted
 
     def process_payment(self, payment_data):
         wallet_id = payment_data['walletId']
         amount = float(payment_data['amount'])
         allocations = payment_data['allocations']
-        
-        wallet = self.get_by_id('Wallets', wallet_id)
-        if not wallet: raise Exception("Wallet not found")
-        
-        current_balance = float(wallet['balance'])
-        if current_balance < amount:
-            raise Exception(f"Insufficient funds. Balance: {current_balance}")
-
-        # Atomic operations on local cache
-        self.update('Wallets', wallet_id, {'balance': current_balance - amount})
-
-        self.create('Payments', {
-            'id': payment_data['id'],
-            'date': payment_data['date'],
-            'amount': amount,
-            'walletId': wallet_id,
-            'vendorId': payment_data['vendorId'],
-            'vendorId': payment_data['vendorId'],
-            'refs': allocations # Store full allocation objects for reversal
-        })
-
-        for alloc in allocations:
-            exp_id = alloc['id']
-            alloc_amt = float(alloc['amount'])
-            expense = self.get_by_id('Expenses', exp_id)
-            if expense:
-                new_bal = max(0, float(expense['balance']) - alloc_amt)
-                self.update('Expenses', exp_id, {
-                    'balance': new_bal,
-                    'status': 'Paid' if new_bal == 0 else 'Partial'
-                })
+
+        # Balance check and all writes in one transaction: one durable write, one sync batch
+        with self.transaction() as txn:
+            wallet = txn.get('Wallets', wallet_id)
+            if not wallet: raise Exception("Wallet not found")
+
+            current_balance = float(wallet['balance'])
+            if current_balance < amount:
+                raise Exception(f"Insufficient funds. Balance: {current_balance}")
+
+            txn.update('Wallets', wallet_id, {'balance': current_balance - amount})
+
+            txn.create('Payments', {
+                'id': payment_data['id'],
+                'date': payment_data['date'],
+                'created': datetime.datetime.now().isoformat(), # Orders same-day entries in the wallet ledger
+                'amount': amount,
+                'walletId': wallet_id,
+                'vendorId': payment_data['vendorId'],
+                'refs': allocations # Store full allocation objects for reversal
+            })
+
+            for alloc in allocations:
+                exp_id = alloc['id']
+                alloc_amt = float(alloc['amount'])
+                expense = txn.get('Expenses', exp_id)
+                if expense:
+                    new_bal = max(0, float(expense['balance']) - alloc_amt)
+                    txn.update('Expenses', exp_id, {
+                        'balance': new_bal,
+                        'status': 'Paid' if new_bal == 0 else 'Partial'
+                    })
         return True
 
     def process_deposit(self, deposit_data):
         wallet_id = deposit_data['walletId']
         amount = float(deposit_data['amount'])
-        
-        wallet = self.get_by_id('Wallets', wallet_id)
-        if not wallet: raise Exception("Wallet not found")
-        
-        current_balance = float(wallet['balance']) if wallet.get('balance') else 0
-
-        self.update('Wallets', wallet_id, {'balance': current_balance + amount})
-
-        self.create('Deposits', {
-            'id': deposit_data['id'],
-            'date': deposit_data['date'],
-            'amount': amount,
-            'walletId': wallet_id,
-            'vendorId': deposit_data.get('vendorId', ''), 
-            'source': 'Vendor Transfer',
-            'notes': deposit_data.get('notes', '')
-        })
+
+        with self.transaction() as txn:
+            wallet = txn.get('Wallets', wallet_id)
+            if not wallet: raise Exception("Wallet not found")
+
+            current_balance = float(wallet['balance']) if wallet.get('balance') else 0
+
+            txn.update('Wallets', wallet_id, {'balance': current_balance + amount})
+
+            txn.create('Deposits', {
+                'id': deposit_data['id'],
+                'date': deposit_data['date'],
+                'created': datetime.datetime.now().isoformat(), # Orders same-day entries in the wallet ledger
+                'amount': amount,
+                'walletId': wallet_id,
+                'vendorId': deposit_data.get('vendorId', ''), 
+                'source': 'Vendor Transfer',
+                'notes': deposit_data.get('notes', '')
+            })
         return True
@@ -0,0 +1,68 @@
+import threading
+import gspread
+import google.auth.exceptions
+from google.oauth2.service_account import Credentials
+
+
+class SheetsClient:
+    """Long-lived, authorized gspread client shared by every sync cycle.
+
+    The gspread client keeps one AuthorizedSession (HTTP connection pool), and
+    google-auth refreshes the access token only when it has expired. The
+    client is rebuilt only after an authentication error (see `reset`).
+    """
+
+    def __init__(self, creds_file, scopes):
+        self.creds_file = creds_file
+        self.scopes = scopes
+        self.lock = threading.Lock()
+        self.stats = {"connections": 0, "token_refreshes": 0, "auth_errors": 0}
+        self._client = None
+        self._spreadsheet = None
+        self._sheet_id = None
+
+    def _authorize(self):
+        creds = Credentials.from_service_account_file(self.creds_file, scopes=self.scopes)
+
+        # Count token exchanges made by google-auth on our behalf
+        refresh = creds.refresh
+        def counted_refresh(request):
+            self.stats["token_refreshes"] += 1
+            return refresh(request)
+        creds.refresh = counted_refresh
+
+        self._client = gspread.authorize(creds)
+        self.stats["connections"] += 1
+
+    def spreadsheet(self, sheet_id):
+        """Returns the opened spreadsheet, connecting only on first use or after reset()"""
+        with self.lock:
+            if self._client is None:
+                self._authorize()
+            if self._spreadsheet is None or self._sheet_id != sheet_id:
+                self._spreadsheet = self._client.open_by_key(sheet_id)
+                self._sheet_id = sheet_id
+            return self._spreadsheet
+
+    def reset(self):
+        """Drops the client so the next call re-authorizes"""
+        with self.lock:
+            self._client = None
+            self._spreadsheet = None
+            self._sheet_id = None
+
+    def handle_error(self, error):
+        """Resets the client if `error` is an authentication failure. Returns True if so"""
+        if is_auth_error(error):
+            self.stats["auth_errors"] += 1
+            self.reset()
+            return True
+        return False
+
+
+def is_auth_error(error):
+    if isinstance(error, (google.auth.exceptions.RefreshError, google.auth.exceptions.DefaultCredentialsError)):
+        return True
+    if isinstance(error, gspread.exceptions.APIError):
+        return getattr(error, 'code', None) == 401
+    return False
@@ -0,0 +1,302 @@
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+import requests
+import gspread
+from gspread.utils import numericise_all
+
+
+class EmulatedSpreadsheet:
+    """In-process stand-in for a gspread Spreadsheet, for offline runs and benchmarks.
+
+    Implements the subset of the gspread API the sync paths use. Every call
+    can be slowed down (latency), rejected with a 429 once more than
+    `quota_per_minute` calls were made in the last 60 seconds, or failed
+    with a 503 at `failure_rate`. Failures are real gspread APIErrors, so the
+    service handles them exactly as it would the Google API's.
+    Rows are kept in memory and, when `state_file` is given, saved there
+    after every write.
+    """
+
+    def __init__(self, titles=(), state_file=None, latency_ms=0, jitter_ms=0,
+                 quota_per_minute=None, failure_rate=0, seed=None):
+        self.id = "emulator"
+        self.title = "Emulated Spreadsheet"
+        self.state_file = state_file
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.quota_per_minute = quota_per_minute
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.lock = threading.RLock()
+        self._recent = deque()   # monotonic times of the calls in the last minute
+        self._worksheets = {}    # title -> EmulatedWorksheet
+        self.stats = {"calls": {}, "quota_errors": 0, "injected_failures": 0, "cells_written": 0}
+
+        self._load()
+        for title in titles:
+            if title not in self._worksheets:
+                self._add(title, [])
+
+    def _load(self):
+        if self.state_file and os.path.exists(self.state_file):
+            try:
+                with open(self.state_file, 'r') as f:
+                    for title, rows in json.load(f).items():
+                        self._add(title, rows)
+            except:
+                print(f"[EMULATOR] Could not read {self.state_file}. Starting empty.")
+
+    def _save(self):
+        if not self.state_file:
+            return
+        tmp = self.state_file + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({t: ws.rows for t, ws in self._worksheets.items()}, f)
+        os.replace(tmp, self.state_file)
+
+    def _add(self, title, rows):
+        ws = EmulatedWorksheet(self, title, len(self._worksheets), rows)
+        self._worksheets[title] = ws
+        return ws
+
+    def _request(self, name):
+        """Accounts one API call and applies the configured latency, quota and failures"""
+        delay = self.latency_ms + (self.random.uniform(0, self.jitter_ms) if self.jitter_ms else 0)
+        if delay:
+            time.sleep(delay / 1000.0)
+
+        with self.lock:
+            self.stats["calls"][name] = self.stats["calls"].get(name, 0) + 1
+
+            if self.quota_per_minute:
+                now = time.monotonic()
+                while self._recent and now - self._recent[0] >= 60:
+                    self._recent.popleft()
+                if len(self._recent) >= self.quota_per_minute:
+                    self.stats["quota_errors"] += 1
+                    retry_after = max(1, int(60 - (now - self._recent[0])) + 1)
+                    raise api_error(429, "RESOURCE_EXHAUSTED",
+                                    "Quota exceeded for quota metric 'Requests per minute'",
+                                    {"Retry-After": str(retry_after)})
+                self._recent.append(now)
+
+            if self.failure_rate and self.random.random() < self.failure_rate:
+                self.stats["injected_failures"] += 1
+                raise api_error(503, "UNAVAILABLE", "The service is currently unavailable.")
+
+    # --- gspread.Spreadsheet API ---
+
+    def worksheet(self, title):
+        self._request("worksheet")
+        with self.lock:
+            if title not in self._worksheets:
+                raise gspread.exceptions.WorksheetNotFound(title)
+            return self._worksheets[title]
+
+    def worksheets(self):
+        self._request("worksheets")
+        with self.lock:
+            return list(self._worksheets.values())
+
+    def add_worksheet(self, title, rows=1000, cols=26, index=None):
+        self._request("add_worksheet")
+        with self.lock:
+            if title in self._worksheets:
+                raise api_error(400, "INVALID_ARGUMENT", f'A sheet with the name "{title}" already exists.')
+            ws = self._add(title, [])
+            self._save()
+            return ws
+
+    def values_batch_get(self, ranges, params=None):
+        self._request("values_batch_get")
+        with self.lock:
+            value_ranges = []
+            for rng in ranges:
+                ws = self._worksheets.get(_sheet_name(rng))
+                if ws is None:
+                    raise api_error(400, "INVALID_ARGUMENT", f"Unable to parse range: {rng}")
+                entry = {"range": rng, "majorDimension": "ROWS"}
+                values = ws._values()
+                if values:
+                    entry["values"] = values
+                value_ranges.append(entry)
+            return {"spreadsheetId": self.id, "valueRanges": value_ranges}
+
+    def batch_update(self, body):
+        self._request("batch_update")
+        with self.lock:
+            by_id = {ws.id: ws for ws in self._worksheets.values()}
+            for req in body.get("requests", []):
+                if "deleteDimension" not in req:
+                    raise api_error(400, "INVALID_ARGUMENT", f"Unsupported request: {list(req)}")
+                rng = req["deleteDimension"]["range"]
+                ws = by_id.get(rng.get("sheetId"))
+                if ws is None or rng.get("dimension") != "ROWS":
+                    raise api_error(400, "INVALID_ARGUMENT", "Invalid deleteDimension range")
+                del ws.rows[rng["startIndex"]:rng["endIndex"]]
+            self._save()
+            return {"spreadsheetId": self.id, "replies": [{} for _ in body.get("requests", [])]}
+
+
+class EmulatedWorksheet:
+    """One worksheet of an EmulatedSpreadsheet; rows are lists of cell strings"""
+
+    def __init__(self, spreadsheet, title, sheet_id, rows):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self.id = sheet_id
+        self.rows = [[_cell(v) for v in row] for row in rows]
+        self.cols = 26 # Grid width, as for a new Google worksheet
+
+    @property
+    def col_count(self):
+        return max([self.cols] + [len(row) for row in self.rows])
+
+    def add_cols(self, cols):
+        self.spreadsheet._request("add_cols")
+        with self.spreadsheet.lock:
+            self.cols = self.col_count + cols
+
+    def _values(self):
+        """All rows without trailing empty cells/rows, as the Sheets API returns them"""
+        values = [_trim(row) for row in self.rows]
+        while values and not values[-1]:
+            values.pop()
+        return values
+
+    def _write(self, row_number, col_number, values):
+        sp = self.spreadsheet
+        for offset, row in enumerate(values):
+            r = row_number - 1 + offset
+            while len(self.rows) <= r:
+                self.rows.append([])
+            target = self.rows[r]
+            for c, v in enumerate(row):
+                col = col_number - 1 + c
+                while len(target) <= col:
+                    target.append('')
+                target[col] = _cell(v)
+            sp.stats["cells_written"] += len(row)
+
+    def row_values(self, row, **kwargs):
+        self.spreadsheet._request("row_values")
+        with self.spreadsheet.lock:
+            return _trim(self.rows[row - 1]) if row <= len(self.rows) else []
+
+    def col_values(self, col, **kwargs):
+        self.spreadsheet._request("col_values")
+        with self.spreadsheet.lock:
+            values = [row[col - 1] if len(row) >= col else '' for row in self.rows]
+            while values and values[-1] == '':
+                values.pop()
+            return values
+
+    def get_all_values(self, **kwargs):
+        self.spreadsheet._request("get_all_values")
+        with self.spreadsheet.lock:
+            return self._values()
+
+    def get_all_records(self, head=1, **kwargs):
+        self.spreadsheet._request("get_all_records")
+        with self.spreadsheet.lock:
+            values = self._values()
+        if len(values) < head:
+            return []
+        headers = values[head - 1]
+        records = []
+        for row in values[head:]:
+            row = list(row[:len(headers)]) + [''] * (len(headers) - len(row))
+            records.append(dict(zip(headers, numericise_all(row))))
+        return records
+
+    def append_row(self, values, **kwargs):
+        self._append("append_row", [values])
+
+    def append_rows(self, values, **kwargs):
+        self._append("append_rows", values)
+
+    def _append(self, name, values):
+        sp = self.spreadsheet
+        sp._request(name)
+        with sp.lock:
+            used = len(self.rows)
+            while used and not any(self.rows[used - 1]):
+                used -= 1
+            self._write(used + 1, 1, values)
+            sp._save()
+
+    def update(self, range_name=None, values=None, **kwargs):
+        # Accept both update(values, range) (gspread 6) and update(range, values) (gspread 5)
+        if isinstance(values, str) or (isinstance(range_name, list) and not isinstance(values, list)):
+            range_name, values = values, range_name
+        sp = self.spreadsheet
+        sp._request("update")
+        with sp.lock:
+            row, col = _a1_start(range_name or "A1")
+            self._write(row, col, values)
+            sp._save()
+
+    def batch_update(self, data, **kwargs):
+        sp = self.spreadsheet
+        sp._request("batch_update")
+        with sp.lock:
+            for entry in data:
+                row, col = _a1_start(entry["range"])
+                self._write(row, col, entry["values"])
+            sp._save()
+
+    def delete_rows(self, start_index, end_index=None):
+        sp = self.spreadsheet
+        sp._request("delete_rows")
+        with sp.lock:
+            del self.rows[start_index - 1:(end_index or start_index)]
+            sp._save()
+
+
+def api_error(code, status, message, headers=None):
+    """Builds a gspread APIError carrying a real HTTP response, like the Google API's"""
+    response = requests.Response()
+    response.status_code = code
+    response.headers.update(headers or {})
+    response._content = json.dumps({"error": {"code": code, "message": message, "status": status}}).encode('utf-8')
+    return gspread.exceptions.APIError(response)
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    return str(value)
+
+
+def _trim(row):
+    end = len(row)
+    while end and row[end - 1] == '':
+        end -= 1
+    return list(row[:end])
+
+
+def _sheet_name(rng):
+    name = rng.split('!')[0]
+    if name.startswith("'") and name.endswith("'"):
+        name = name[1:-1].replace("''", "'")
+    return name
+
+
+def _a1_start(rng):
+    """(row, col) of the top-left cell of an A1 range such as 'A5' or 'Vendors!B2:D9'"""
+    cell = rng.split('!')[-1].split(':')[0]
+    match = re.match(r"^([A-Za-z]+)(\d+)$", cell)
+    if not match:
+        raise api_error(400, "INVALID_ARGUMENT", f"Unable to parse range: {rng}")
+    letters, row = match.groups()
+    col = 0
+    for ch in letters.upper():
+        col = col * 26 + ord(ch) - ord('A') + 1
+    return int(row), col
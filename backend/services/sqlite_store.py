@@ -0,0 +1,270 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from services.journal import LocalJournal
+from services.storage import RESOURCES, DATE_MAX, ref_values, encode_cursor, decode_cursor
+
+# Columns copied out of the JSON record so they can be indexed and filtered in SQL
+INDEXED_FIELDS = {
+    'Vendors': [],
+    'Wallets': [],
+    'Expenses': ['vendorId', 'status', 'category', 'date'],
+    'Payments': ['walletId', 'vendorId', 'date'],
+    'Deposits': ['walletId', 'vendorId', 'date']
+}
+
+
+class SqliteStore:
+    """Optional storage engine backed by SQLite in WAL mode.
+
+    Each resource is a table keyed by id, with the full record kept as JSON in
+    `data` and the foreign-key/filter fields duplicated into indexed columns.
+    Row order (rowid) preserves insertion order, matching JsonStore.
+    Payment allocations are mirrored into PaymentRefs (expenseId -> paymentId).
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(db_file, check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+
+    def load(self):
+        with self.lock:
+            self.conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+            for res in RESOURCES:
+                cols = ''.join(f', "{c}" TEXT' for c in INDEXED_FIELDS[res])
+                self.conn.execute(f'CREATE TABLE IF NOT EXISTS "{res}" (id TEXT PRIMARY KEY, data TEXT NOT NULL{cols})')
+                for c in INDEXED_FIELDS[res]:
+                    self.conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_{res}_{c}" ON "{res}" ("{c}")')
+                    # Empty values are stored as NULL so they sort and filter like JsonStore
+                    self.conn.execute(f'UPDATE "{res}" SET "{c}" = NULL WHERE "{c}" = \'\'')
+            self.conn.execute('CREATE TABLE IF NOT EXISTS PaymentRefs (paymentId TEXT NOT NULL, expenseId TEXT NOT NULL)')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_PaymentRefs_expenseId ON PaymentRefs (expenseId)')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_PaymentRefs_paymentId ON PaymentRefs (paymentId)')
+
+    @contextmanager
+    def _transaction(self):
+        with self.lock:
+            self.conn.execute('BEGIN')
+            try:
+                yield
+                self.conn.execute('COMMIT')
+            except:
+                self.conn.execute('ROLLBACK')
+                raise
+
+    def _row_values(self, resource, record):
+        values = [str(record.get('id')), json.dumps(record)]
+        for c in INDEXED_FIELDS.get(resource, []):
+            v = record.get(c)
+            values.append(None if v is None or v == '' else str(v))
+        return values
+
+    def _insert_sql(self, resource):
+        cols = ['id', 'data'] + INDEXED_FIELDS.get(resource, [])
+        names = ', '.join(f'"{c}"' for c in cols)
+        marks = ', '.join('?' for _ in cols)
+        return f'INSERT OR REPLACE INTO "{resource}" ({names}) VALUES ({marks})'
+
+    def _write_refs(self, resource, record, id_val=None):
+        """Keeps PaymentRefs in step with a Payment's allocations"""
+        if resource != 'Payments': return
+        pay_id = str(record.get('id') if id_val is None else id_val)
+        self.conn.execute('DELETE FROM PaymentRefs WHERE paymentId = ?', (pay_id,))
+        self.conn.executemany(
+            'INSERT INTO PaymentRefs (paymentId, expenseId) VALUES (?, ?)',
+            [(pay_id, exp_id) for exp_id in ref_values(record, 'refs')]
+        )
+
+    def _select_refs(self, resource, field, value, limit=None):
+        if field == 'refs':
+            sql = 'SELECT p.data FROM "Payments" p JOIN PaymentRefs r ON r.paymentId = p.id WHERE r.expenseId = ? ORDER BY p.rowid'
+        elif field in INDEXED_FIELDS.get(resource, []):
+            sql = f'SELECT data FROM "{resource}" WHERE "{field}" = ? ORDER BY rowid'
+        else:
+            return []
+        if limit: sql += f' LIMIT {int(limit)}'
+        with self.lock:
+            rows = self.conn.execute(sql, (str(value),)).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def find(self, resource, field, value):
+        return self._select_refs(resource, field, value)
+
+    def first(self, resource, field, value):
+        rows = self._select_refs(resource, field, value, limit=1)
+        return rows[0] if rows else None
+
+    def query(self, resource, filters=None, date_from=None, date_to=None,
+              sort=None, descending=False, limit=None, cursor=None):
+        """One page of filtered, sorted records. Returns (records, next_cursor).
+
+        Filters and date ranges use the indexed columns (and PaymentRefs for
+        'refs'); pagination is keyset-based on (sort value, id), or on rowid
+        for insertion order.
+        """
+        if resource not in INDEXED_FIELDS: return [], None
+        after = decode_cursor(cursor)
+        where, params = [], []
+        for field, value in (filters or {}).items():
+            if field == 'refs':
+                where.append('id IN (SELECT paymentId FROM PaymentRefs WHERE expenseId = ?)')
+            else:
+                where.append(f'"{field}" = ?')
+            params.append(str(value))
+        if date_from:
+            where.append('"date" >= ?')
+            params.append(date_from)
+        if date_to:
+            where.append('"date" <= ?')
+            params.append(date_to + DATE_MAX)
+
+        op = '<' if descending else '>'
+        order = 'DESC' if descending else 'ASC'
+        if sort is None:
+            expr = 'rowid'
+            if after is not None:
+                where.append(f'rowid {op} ?')
+                params.append(after[0])
+            order_by = f'rowid {order}'
+        else:
+            if sort == 'id':
+                expr = 'id'
+            elif sort in INDEXED_FIELDS[resource]:
+                expr = f'"{sort}"'
+            else:
+                expr = f"NULLIF(json_extract(data, '$.{sort}'), '')"
+            if after is not None:
+                value, id_key = after
+                # NULLs sort first, as in JsonStore
+                if value is None:
+                    where.append(f'({expr} IS NULL AND id {op} ?)' if descending else
+                                 f'(({expr} IS NULL AND id {op} ?) OR {expr} IS NOT NULL)')
+                    params.append(id_key)
+                else:
+                    null_rows = f' OR {expr} IS NULL' if descending else ''
+                    where.append(f'({expr} {op} ? OR ({expr} = ? AND id {op} ?){null_rows})')
+                    params.extend([value, value, id_key])
+            order_by = f'{expr} {order}, id {order}'
+
+        sql = f'SELECT rowid, id, {expr}, data FROM "{resource}"'
+        if where: sql += ' WHERE ' + ' AND '.join(where)
+        sql += f' ORDER BY {order_by}'
+        if limit is not None: sql += f' LIMIT {int(limit) + 1}'
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            rowid, id_key, value, _ = rows[-1]
+            next_cursor = encode_cursor([rowid, id_key] if sort is None else [value, id_key])
+        return [json.loads(r[3]) for r in rows], next_cursor
+
+    def all(self, resource):
+        if resource not in INDEXED_FIELDS: return []
+        with self.lock:
+            rows = self.conn.execute(f'SELECT data FROM "{resource}" ORDER BY rowid').fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def get(self, resource, id_val):
+        if resource not in INDEXED_FIELDS: return None
+        with self.lock:
+            row = self.conn.execute(f'SELECT data FROM "{resource}" WHERE id = ?', (str(id_val),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def insert(self, resource, record):
+        with self._transaction():
+            self._insert_row(resource, record)
+        return record
+
+    def replace(self, resource, id_val, record):
+        with self._transaction():
+            done = self._replace_row(resource, id_val, record)
+        return record if done else None
+
+    def remove(self, resource, id_val):
+        with self._transaction():
+            done = self._remove_row(resource, id_val)
+        return done
+
+    def apply(self, changes):
+        """Applies (action, resource, id_val, record) changes in one transaction"""
+        with self._transaction():
+            for action, resource, id_val, record in changes:
+                if action == 'create':
+                    self._insert_row(resource, record)
+                elif action == 'update':
+                    self._replace_row(resource, id_val, record)
+                elif action == 'delete':
+                    self._remove_row(resource, id_val)
+
+    def _insert_row(self, resource, record):
+        self.conn.execute(self._insert_sql(resource), self._row_values(resource, record))
+        self._write_refs(resource, record)
+
+    def _replace_row(self, resource, id_val, record):
+        cols = ['data'] + INDEXED_FIELDS.get(resource, [])
+        assignments = ', '.join(f'"{c}" = ?' for c in cols)
+        values = self._row_values(resource, record)[1:] + [str(id_val)]
+        cur = self.conn.execute(f'UPDATE "{resource}" SET {assignments} WHERE id = ?', values)
+        if cur.rowcount: self._write_refs(resource, record, id_val)
+        return cur.rowcount > 0
+
+    def _remove_row(self, resource, id_val):
+        cur = self.conn.execute(f'DELETE FROM "{resource}" WHERE id = ?', (str(id_val),))
+        if resource == 'Payments':
+            self.conn.execute('DELETE FROM PaymentRefs WHERE paymentId = ?', (str(id_val),))
+        return cur.rowcount > 0
+
+    def replace_all(self, data):
+        """Replaces every table in a single transaction (full pull / migration)"""
+        with self._transaction():
+            self.conn.execute('DELETE FROM PaymentRefs')
+            for res in RESOURCES:
+                self.conn.execute(f'DELETE FROM "{res}"')
+                self.conn.executemany(
+                    self._insert_sql(res),
+                    [self._row_values(res, r) for r in data.get(res, [])]
+                )
+            for p in data.get('Payments', []):
+                self._write_refs('Payments', p)
+
+    def is_empty(self):
+        with self.lock:
+            for res in RESOURCES:
+                if self.conn.execute(f'SELECT 1 FROM "{res}" LIMIT 1').fetchone():
+                    return False
+        return True
+
+    def dump(self):
+        return {res: self.all(res) for res in RESOURCES}
+
+    def flush(self):
+        with self.lock:
+            self.conn.execute('PRAGMA wal_checkpoint(PASSIVE)')
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def migrate_from_json(self, snapshot_file, log_file):
+        """Imports an existing local_db.json (+ journal) once, on first start"""
+        with self.lock:
+            done = self.conn.execute("SELECT value FROM meta WHERE key = 'migrated_from_json'").fetchone()
+        if done or not (os.path.exists(snapshot_file) or os.path.exists(log_file)) or not self.is_empty():
+            return False
+
+        data = LocalJournal(snapshot_file, log_file).load()
+        self.replace_all(data)
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated_from_json', ?)", (snapshot_file,))
+        count = sum(len(data.get(res, [])) for res in RESOURCES)
+        print(f"[STORAGE] Migrated {count} records from {os.path.basename(snapshot_file)} to SQLite.")
+        return True
@@ -0,0 +1,501 @@
+import base64
+import json
+from bisect import bisect_left, bisect_right, insort
+from itertools import islice
+from services.journal import LocalJournal
+
+RESOURCES = ['Vendors', 'Wallets', 'Expenses', 'Payments', 'Deposits']
+
+# Fields kept as secondary indexes (resource -> fields): foreign keys for
+# find/first, and the equality filters accepted by query().
+# 'refs' indexes a Payment by the Expense ids it was allocated to.
+FILTER_FIELDS = {
+    'Expenses': ['vendorId', 'status', 'category'],
+    'Payments': ['walletId', 'vendorId', 'refs'],
+    'Deposits': ['walletId', 'vendorId']
+}
+
+# Fields query() can sort by. JsonStore keeps every resource (and every
+# FILTER_FIELDS bucket) sorted by each of these and by insertion order.
+SORT_FIELDS = {
+    'Vendors': ['id', 'name'],
+    'Wallets': ['id', 'name', 'balance'],
+    'Expenses': ['id', 'date', 'total', 'balance'],
+    'Payments': ['id', 'date', 'amount'],
+    'Deposits': ['id', 'date', 'amount']
+}
+
+# Appended to date_to so that '2025-01-31' also matches '2025-01-31T10:00'
+DATE_MAX = '\uffff'
+
+# Deleted rows leave a tombstone (None) in JsonStore's lists; a list is compacted
+# once more than half of it (and at least this many rows) is tombstones
+COMPACT_MIN_DEAD = 64
+
+
+def ref_values(record, field):
+    """Returns the referenced ids (as strings) held by `field` of a record"""
+    value = record.get(field)
+    if field != 'refs':
+        return [] if value is None or value == '' else [str(value)]
+
+    # Handle potential string format from legacy/remote data
+    refs = value or []
+    if isinstance(refs, str):
+        try: refs = json.loads(refs)
+        except: refs = []
+    if not isinstance(refs, list): return []
+
+    # Legacy ref was list of IDs; New ref is list of {id, amount}
+    ids = []
+    for r in refs:
+        if isinstance(r, dict): ids.append(str(r.get('id')))
+        else: ids.append(str(r))
+    return ids
+
+
+def sort_value(value):
+    """Orders mixed cell values like SQLite: empty first, then numbers, then text"""
+    if value is None or value == '':
+        return (0, 0)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    return (2, str(value))
+
+
+def encode_cursor(key):
+    """Opaque pagination cursor holding the sort key of the last record returned"""
+    raw = json.dumps(key, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        return _as_tuple(json.loads(raw))
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def _as_tuple(value):
+    return tuple(_as_tuple(v) for v in value) if isinstance(value, list) else value
+
+
+def _discard(keys, key):
+    """Removes one occurrence of `key` from the sorted list `keys`"""
+    i = bisect_left(keys, key)
+    if i < len(keys) and keys[i] == key: del keys[i]
+
+
+def _order_key(order, record, seq):
+    """A row's key in one JsonStore query order; it always ends with the row id.
+
+    Insertion order (None) is (seq, id), 'id' is (id,), 'date' is (date, id)
+    and any other field (rank, value, id) as ordered by sort_value().
+    """
+    id_key = str(record.get('id'))
+    if order is None:
+        return (seq, id_key)
+    if order == 'id':
+        return (id_key,)
+    if order == 'date':
+        return (_date_of(record), id_key)
+    return sort_value(record.get(order)) + (id_key,)
+
+
+class _Bucket:
+    """JsonStore rows sharing one value of a FILTER_FIELDS field.
+
+    `orders` holds the bucket's rows as sorted _order_key() lists, one per
+    query order. Each list is built the first time a query needs it and is
+    then kept up to date on every write, so a filtered page is a bisect plus
+    a short walk.
+    """
+
+    __slots__ = ('field', 'value', 'ids', 'orders')
+
+    def __init__(self, field, value):
+        self.field = field
+        self.value = value
+        self.ids = {}    # str(id) -> rows with that id (ordered set; remote data can repeat ids)
+        self.orders = {} # order -> sorted keys
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, id_key, key_of):
+        self.ids[id_key] = self.ids.get(id_key, 0) + 1
+        for order, entries in self.orders.items():
+            insort(entries, key_of(order))
+
+    def discard(self, id_key, key_of):
+        count = self.ids.get(id_key, 0) - 1
+        if count > 0: self.ids[id_key] = count
+        else: self.ids.pop(id_key, None)
+        for order, entries in self.orders.items():
+            _discard(entries, key_of(order))
+
+
+class JsonStore:
+    """Default storage engine: in-memory lists persisted through LocalJournal.
+
+    Storage engines share one small contract used by SheetsService:
+    load, all, get, find, first, query, insert, replace, remove, apply,
+    replace_all, is_empty, dump, flush, close.
+    Writers are serialized by SheetsService.lock.
+    """
+
+    name = 'json'
+
+    def __init__(self, snapshot_file, log_file, compact_every=1000, fsync=True):
+        self.journal = LocalJournal(snapshot_file, log_file, compact_every=compact_every, fsync=fsync)
+        self.data = {}           # resource -> list of records, None where a record was deleted
+        self.dead = {}           # resource -> number of None entries in self.data
+        self.positions = {}      # resource -> {str(id): list position}
+        self.duplicates = {}     # resource -> {str(id): positions of later rows with the same id}
+        self.refs = {}           # resource -> field -> {str(value): _Bucket}
+        self.orders = {}         # resource -> sort field -> sorted _order_key() of every row, built on first use
+        self.seqs = {}           # resource -> insertion sequence number per list position
+        self.next_seq = {}       # resource -> next sequence number
+
+    def load(self):
+        try:
+            self.data = self.journal.load()
+        except:
+            self.data = {}
+
+        # Ensure structure
+        for res in RESOURCES:
+            if res not in self.data: self.data[res] = []
+        self._reindex()
+
+    def _reindex(self):
+        """Rebuilds the primary-key and foreign-key indexes for every resource.
+        Sort orders are dropped and rebuilt by the next query that needs them."""
+        self.positions = {}
+        self.duplicates = {}
+        self.dead = {}
+        self.refs = {}
+        self.orders = {}
+        self.seqs = {}
+        self.next_seq = {}
+        for res, records in self.data.items():
+            if not isinstance(records, list): continue
+            self.seqs[res] = list(range(len(records)))
+            self.next_seq[res] = len(records)
+            self._index_positions(res)
+            by_field = self.refs[res] = {}
+            for field in FILTER_FIELDS.get(res, []):
+                buckets = by_field[field] = {}
+                for r in records:
+                    id_key = str(r.get('id'))
+                    for v in ref_values(r, field):
+                        bucket = buckets.get(v)
+                        if bucket is None: bucket = buckets[v] = _Bucket(field, v)
+                        bucket.ids[id_key] = bucket.ids.get(id_key, 0) + 1
+
+    def _index_positions(self, resource):
+        """Rebuilds id -> position for one resource's list"""
+        index, dupes = {}, {}
+        for i, r in enumerate(self.data[resource]):
+            if r is None: continue
+            key = str(r.get('id'))
+            if key in index:
+                dupes.setdefault(key, []).append(i) # First occurrence of an id wins
+            else:
+                index[key] = i
+        self.positions[resource] = index
+        self.duplicates[resource] = dupes
+        self.dead[resource] = 0
+
+    def _sorted_keys(self, resource, order, bucket=None):
+        """Sorted _order_key() list of a resource's rows (or one bucket's).
+
+        Built with one sort the first time it is needed, then maintained by
+        _index() on every write.
+        """
+        orders = self.orders.setdefault(resource, {}) if bucket is None else bucket.orders
+        keys = orders.get(order)
+        if keys is None:
+            if order is not None and order not in SORT_FIELDS.get(resource, []):
+                return []
+            records, seqs = self.data.get(resource, []), self.seqs.get(resource, [])
+            if bucket is None:
+                rows = [p for p, r in enumerate(records) if r is not None]
+            else:
+                index, dupes = self.positions.get(resource, {}), self.duplicates.get(resource, {})
+                rows = [p for id_key in bucket.ids for p in [index[id_key]] + dupes.get(id_key, [])
+                        if bucket.value in ref_values(records[p], bucket.field)]
+            keys = orders[order] = sorted(_order_key(order, records[p], seqs[p]) for p in rows)
+        return keys
+
+    def _index(self, resource, old, new, seq):
+        """Moves the row at insertion sequence `seq` from `old` to `new` in the
+        foreign-key buckets and the sort orders built so far (None for an
+        insert or a delete)"""
+        old_key = lambda order: _order_key(order, old, seq)
+        new_key = lambda order: _order_key(order, new, seq)
+
+        for order, entries in self.orders.get(resource, {}).items():
+            before = old_key(order) if old is not None else None
+            after = new_key(order) if new is not None else None
+            if before == after: continue
+            if before is not None: _discard(entries, before)
+            if after is not None: insort(entries, after)
+
+        by_field = self.refs.setdefault(resource, {})
+        for field in FILTER_FIELDS.get(resource, []):
+            buckets = by_field.setdefault(field, {})
+            before = set(ref_values(old, field)) if old is not None else set()
+            after = set(ref_values(new, field)) if new is not None else set()
+            for v in before - after:
+                bucket = buckets.get(v)
+                if bucket is None: continue
+                bucket.discard(str(old.get('id')), old_key)
+                if not bucket: del buckets[v]
+            for v in after - before:
+                bucket = buckets.get(v)
+                if bucket is None: bucket = buckets[v] = _Bucket(field, v)
+                bucket.add(str(new.get('id')), new_key)
+            for v in before & after:
+                # Same bucket, same id: only orders whose key changed move
+                for order, entries in buckets[v].orders.items():
+                    before_key, after_key = old_key(order), new_key(order)
+                    if before_key != after_key:
+                        _discard(entries, before_key)
+                        insort(entries, after_key)
+
+    def all(self, resource):
+        records = self.data.get(resource, [])
+        if not self.dead.get(resource):
+            return records
+        return [r for r in records if r is not None]
+
+    def get(self, resource, id_val):
+        pos = self.positions.get(resource, {}).get(str(id_val))
+        if pos is None: return None
+        return self.data[resource][pos]
+
+    def _bucket(self, resource, field, value):
+        bucket = self.refs.get(resource, {}).get(field, {}).get(str(value))
+        return bucket if bucket is not None else _Bucket(field, str(value))
+
+    def find(self, resource, field, value):
+        """Returns records whose foreign-key `field` references `value`, in list order"""
+        index = self.positions.get(resource, {})
+        positions = sorted(index[i] for i in self._bucket(resource, field, value).ids if i in index)
+        return [self.data[resource][p] for p in positions]
+
+    def first(self, resource, field, value):
+        """Returns any one record referencing `value` through `field`, or None"""
+        for id_key in self._bucket(resource, field, value).ids:
+            return self.get(resource, id_key)
+        return None
+
+    def query(self, resource, filters=None, date_from=None, date_to=None,
+              sort=None, descending=False, limit=None, cursor=None):
+        """One page of filtered, sorted records. Returns (records, next_cursor).
+
+        Each resource and each filter bucket keeps a sorted list per sort
+        order, built on first use and then kept up to date by writes, so a
+        page bisects to the cursor in one sorted list (the smallest bucket's,
+        or the table's) and walks it until the page is full: O(log n + rows
+        examined), nothing is sorted per page. Other filters, and a date
+        range when not sorting by date, are checked per row; a narrow date
+        range is instead read from the date order and sorted when that is
+        cheaper. Cursors are keyset-based, so inserts and deletes between pages
+        do not skip or repeat rows.
+        """
+        after = decode_cursor(cursor)
+        if after is not None and not isinstance(after, tuple):
+            raise ValueError("Invalid cursor")
+        ranged = bool(date_from or date_to)
+        low = (date_from or '\x00',)           # Empty dates never match a range
+        high = ((date_to or '') + DATE_MAX,)
+
+        # 1. Walk the smallest filter bucket; the other buckets are checked per row
+        buckets = sorted((self._bucket(resource, f, v) for f, v in (filters or {}).items()), key=len)
+        if buckets and not buckets[0]:
+            return [], None
+        others = [b.ids for b in buckets[1:]]
+        table = not buckets and sort is None # Insertion order of the table: walk the list itself
+
+        def keys_for(order):
+            return self._sorted_keys(resource, order, buckets[0] if buckets else None)
+
+        try:
+            lo, hi = 0, None
+            check_range = ranged and sort != 'date'
+            if ranged and sort == 'date':
+                keys = keys_for('date')
+                lo, hi = bisect_left(keys, low), bisect_right(keys, high)
+            elif ranged:
+                # 2. Narrow date range: collect it from the date order and sort it
+                dated = keys_for('date')
+                d_lo, d_hi = bisect_left(dated, low), bisect_right(dated, high)
+                matched = d_hi - d_lo
+                # Walking the sort order reads about (limit + 1) * size / matched rows
+                size = len(buckets[0]) if buckets else len(self.positions.get(resource, {}))
+                if limit is None or matched * matched <= (limit + 1) * size:
+                    return self._sorted_page(resource, dated[d_lo:d_hi], others, sort, descending, limit, after)
+
+            # 3. Walk one sorted list from the cursor
+            if table:
+                walk = self._walk_table(resource, after, descending)
+            else:
+                keys = keys_for(sort)
+                hi = len(keys) if hi is None else hi
+                if after is not None:
+                    if descending: hi = min(hi, bisect_left(keys, after, lo, hi))
+                    else: lo = max(lo, bisect_right(keys, after, lo, hi))
+                walk = self._walk(resource, keys, lo, hi, descending)
+
+            if others or check_range:
+                walk = (kr for kr in walk
+                        if all(kr[0][-1] in ids for ids in others)
+                        and (not check_range or low <= (_date_of(kr[1]),) <= high))
+            return self._paginate(list(islice(walk, None if limit is None else limit + 1)), limit)
+        except TypeError:
+            if after is None: raise
+            raise ValueError("Invalid cursor") # A cursor from another sort order
+
+    def _walk(self, resource, keys, lo, hi, descending):
+        """(key, record) for keys[lo:hi] in order; a key's last element is the row id"""
+        records, index = self.data[resource], self.positions.get(resource, {})
+        for i in (range(hi - 1, lo - 1, -1) if descending else range(lo, hi)):
+            pos = index.get(keys[i][-1])
+            if pos is not None: yield keys[i], records[pos]
+
+    def _walk_table(self, resource, after, descending):
+        """(key, record) in insertion order, straight from the list; the key is
+        (seq, id), which stays valid when rows before it are deleted"""
+        records, seqs = self.data.get(resource, []), self.seqs.get(resource, [])
+        start, stop = 0, len(records)
+        if after is not None:
+            if descending: stop = bisect_left(seqs, after[0])
+            else: start = bisect_right(seqs, after[0])
+        for p in (range(stop - 1, -1, -1) if descending else range(start, stop)):
+            if records[p] is not None:
+                yield (seqs[p], str(records[p].get('id'))), records[p]
+
+    def _sorted_page(self, resource, dated, others, sort, descending, limit, after):
+        """Page from the rows of a date range (date keys), sorted by `sort`"""
+        records, index, seqs = self.data[resource], self.positions.get(resource, {}), self.seqs.get(resource, [])
+        keyed = []
+        for key in dated:
+            pos = index.get(key[1])
+            if pos is None or not all(key[1] in ids for ids in others): continue
+            row_key = _order_key(sort, records[pos], seqs[pos])
+            if after is None or (row_key < after if descending else row_key > after):
+                keyed.append((row_key, records[pos]))
+        keyed.sort(key=lambda kr: kr[0], reverse=descending)
+        return self._paginate(keyed, limit)
+
+    def _paginate(self, keyed, limit):
+        """Cuts (key, record) pairs to `limit`; the cursor is the last key kept"""
+        if limit is None or len(keyed) <= limit:
+            return [r for _, r in keyed], None
+        page = keyed[:limit]
+        return [r for _, r in page], encode_cursor(page[-1][0])
+
+    def insert(self, resource, record):
+        self.apply([('create', resource, None, record)])
+        return record
+
+    def replace(self, resource, id_val, record):
+        if str(id_val) not in self.positions.get(resource, {}): return None
+        self.apply([('update', resource, id_val, record)])
+        return record
+
+    def remove(self, resource, id_val):
+        if str(id_val) not in self.positions.get(resource, {}): return False
+        self.apply([('delete', resource, id_val, None)])
+        return True
+
+    def apply(self, changes):
+        """Applies (action, resource, id_val, record) changes in order and journals
+        them as one entry, so after a crash either all or none of them are replayed"""
+        for action, resource, id_val, record in changes:
+            if action == 'create':
+                self._insert(resource, record)
+            elif action == 'update':
+                self._replace(resource, id_val, record)
+            elif action == 'delete':
+                self._remove(resource, id_val)
+        self.journal.append_many(changes)
+        if self.journal.needs_compaction():
+            self.journal.compact(self.dump())
+
+    def _insert(self, resource, record):
+        if resource not in self.data: self.data[resource] = []
+        records = self.data[resource]
+        key = str(record.get('id'))
+        index = self.positions.setdefault(resource, {})
+        if key in index:
+            self.duplicates.setdefault(resource, {}).setdefault(key, []).append(len(records))
+        else:
+            index[key] = len(records)
+        seq = self.next_seq.get(resource, 0)
+        self._index(resource, None, record, seq)
+        records.append(record)
+        self.seqs.setdefault(resource, []).append(seq)
+        self.next_seq[resource] = seq + 1
+
+    def _replace(self, resource, id_val, record):
+        pos = self.positions.get(resource, {}).get(str(id_val))
+        if pos is None: return
+        self._index(resource, self.data[resource][pos], record, self.seqs[resource][pos])
+        self.data[resource][pos] = record
+
+    def _remove(self, resource, id_val):
+        """Replaces the row with a tombstone, so no later row has to move"""
+        key = str(id_val)
+        pos = self.positions.get(resource, {}).pop(key, None)
+        if pos is None: return
+
+        # Removes every row carrying this id (duplicates can come from remote data)
+        records = self.data[resource]
+        for p in [pos] + self.duplicates.get(resource, {}).pop(key, []):
+            self._index(resource, records[p], None, self.seqs[resource][p])
+            records[p] = None
+            self.dead[resource] = self.dead.get(resource, 0) + 1
+
+        if self.dead[resource] >= COMPACT_MIN_DEAD and self.dead[resource] * 2 > len(records):
+            self._compact(resource)
+
+    def _compact(self, resource):
+        """Drops a resource's tombstones: O(n), but only after n/2 deletes"""
+        records, seqs = self.data[resource], self.seqs[resource]
+        live = [p for p, r in enumerate(records) if r is not None]
+        # New lists rather than in-place edits: readers may be iterating the old ones
+        self.data[resource] = [records[p] for p in live]
+        self.seqs[resource] = [seqs[p] for p in live]
+        self._index_positions(resource)
+
+    def replace_all(self, data):
+        """Replaces every table (full pull) and writes a fresh snapshot"""
+        self.data = data
+        for res in RESOURCES:
+            if res not in self.data: self.data[res] = []
+        self._reindex()
+        self.journal.compact(self.data)
+
+    def is_empty(self):
+        return sum(len(v) - self.dead.get(res, 0) for res, v in self.data.items() if isinstance(v, list)) == 0
+
+    def dump(self):
+        return {res: self.all(res) if isinstance(v, list) else v for res, v in self.data.items()}
+
+    def flush(self):
+        self.journal.compact(self.dump())
+
+    def close(self):
+        pass
+
+
+def _date_of(record):
+    value = record.get('date')
+    return '' if value is None else str(value)
+
@@ -0,0 +1,209 @@
+import json
+import os
+from collections import deque
+
+
+class SyncQueue:
+    """Durable FIFO of pending sync items, stored as append-only segment files.
+
+    Items are appended as JSON lines to `seg-<first seq>.log` files inside
+    `directory`, and each one gets a monotonically increasing `seq`. Acking
+    only moves the acknowledged-offset cursor (`cursor.json`), so enqueue
+    and ack are O(1); segments whose items are all acked are deleted.
+    Unacked items are also kept in memory for peek/len/iteration.
+
+    Items enqueued together by extend() are written at once and tagged with
+    the seq of the batch's last item (`batch_end`); a batch cut short by a
+    crash is dropped whole on load.
+
+    A batch being pushed can be staged as a plan (`inflight.json`) with its
+    progress in `inflight.done`, so a push interrupted by an error or a
+    crash resumes where it stopped instead of re-sending applied operations.
+    """
+
+    def __init__(self, directory, segment_size=1000, fsync=True):
+        self.directory = directory
+        self.cursor_file = os.path.join(directory, 'cursor.json')
+        self.plan_file = os.path.join(directory, 'inflight.json')
+        self.plan_done_file = os.path.join(directory, 'inflight.done')
+        self.segment_size = max(1, int(segment_size))
+        self.fsync = fsync
+        self.items = deque()
+        self.acked = 0           # Highest acknowledged seq
+        self.next_seq = 1
+        self.segments = deque()  # [first_seq, path, item_count], oldest first
+        self.plan = None         # Staged batch: {'through', 'count', 'ops', 'done'}
+        self._writer = None
+
+    def load(self):
+        os.makedirs(self.directory, exist_ok=True)
+        if os.path.exists(self.cursor_file):
+            try:
+                with open(self.cursor_file, 'r') as f:
+                    self.acked = int(json.load(f).get('acked', 0))
+            except:
+                self.acked = 0
+
+        self.items.clear()
+        self.segments.clear()
+        self.next_seq = self.acked + 1
+        names = sorted(n for n in os.listdir(self.directory) if n.startswith('seg-') and n.endswith('.log'))
+        for name in names:
+            path = os.path.join(self.directory, name)
+            count, last_seq = self._read_segment(path)
+            if last_seq <= self.acked:
+                os.remove(path) # Fully acked, left over from a crash
+                continue
+            self.segments.append([int(name[4:-4]), path, count])
+            self.next_seq = max(self.next_seq, last_seq + 1)
+        self._load_plan()
+
+    def _load_plan(self):
+        self.plan = None
+        if not os.path.exists(self.plan_file): return
+        try:
+            with open(self.plan_file, 'r') as f:
+                plan = json.load(f)
+            plan['done'] = 0
+            if os.path.exists(self.plan_done_file):
+                with open(self.plan_done_file, 'r') as f:
+                    plan['done'] = int(f.read().strip() or 0)
+            # Only valid if it still describes the head of the queue
+            count = plan['count']
+            if 0 < count <= len(self.items) and self.items[count - 1]['seq'] == plan['through']:
+                self.plan = plan
+        except:
+            self.plan = None
+        if self.plan is None:
+            self._clear_plan_files()
+
+    def _read_segment(self, path):
+        """Loads unacked items from one segment, truncating a torn tail or incomplete batch"""
+        count, last_seq, good_offset = 0, 0, 0
+        batch_start = None # (offset, count, last_seq, first seq) of a batch not yet read to its end
+        with open(path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    break
+                if item.get('batch_end', item['seq']) > item['seq']:
+                    if batch_start is None: batch_start = (good_offset, count, last_seq, item['seq'])
+                else:
+                    batch_start = None
+                good_offset += len(line)
+                count += 1
+                last_seq = item['seq']
+                if item['seq'] > self.acked:
+                    self.items.append(item)
+        if batch_start is not None:
+            good_offset, count, last_seq, torn_seq = batch_start
+            # Only the torn batch: items from earlier segments stay queued
+            while self.items and self.items[-1]['seq'] >= torn_seq:
+                self.items.pop()
+        if good_offset < os.path.getsize(path):
+            with open(path, 'r+b') as f:
+                f.truncate(good_offset)
+        return count, last_seq
+
+    def _sync_file(self, f):
+        f.flush()
+        if self.fsync:
+            os.fsync(f.fileno())
+
+    def _write_atomic(self, path, text):
+        tmp_file = path + '.tmp'
+        with open(tmp_file, 'w') as f:
+            f.write(text)
+            self._sync_file(f)
+        os.replace(tmp_file, path)
+
+    def _clear_plan_files(self):
+        for path in (self.plan_done_file, self.plan_file):
+            if os.path.exists(path): os.remove(path)
+
+    def append(self, item):
+        """Durably enqueues an item and returns its seq"""
+        return self.extend([item])[0]
+
+    def extend(self, items):
+        """Durably enqueues several items as one batch with a single write. Returns their seqs"""
+        if not items: return []
+        first = self.next_seq
+        last = first + len(items) - 1
+        self.next_seq = last + 1
+
+        # A batch always goes to one segment, which may then exceed segment_size
+        if not self.segments or self.segments[-1][2] >= self.segment_size:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+            path = os.path.join(self.directory, f"seg-{first:012d}.log")
+            self.segments.append([first, path, 0])
+        segment = self.segments[-1]
+        if self._writer is None:
+            self._writer = open(segment[1], 'a')
+
+        lines = []
+        for seq, item in enumerate(items, first):
+            item = dict(item)
+            item['seq'] = seq
+            if last > first: item['batch_end'] = last
+            lines.append(json.dumps(item) + '\n')
+            self.items.append(item)
+        self._writer.write(''.join(lines))
+        self._sync_file(self._writer)
+        segment[2] += len(items)
+        return list(range(first, last + 1))
+
+    def peek(self, n=1):
+        """Returns up to n unacked items, oldest first, without removing them"""
+        n = min(n, len(self.items))
+        return [self.items[i] for i in range(n)]
+
+    def since(self, seq):
+        """Unacked items from `seq` on, oldest first"""
+        tail = []
+        for item in reversed(self.items):
+            if item['seq'] < seq: break
+            tail.append(item)
+        return tail[::-1]
+
+    def ack(self, n=1):
+        """Acknowledges the n oldest items and persists the cursor"""
+        n = min(n, len(self.items))
+        if n <= 0: return
+        for _ in range(n):
+            self.acked = self.items.popleft()['seq']
+
+        self._write_atomic(self.cursor_file, json.dumps({'acked': self.acked}))
+
+        # Drop segments that are now fully acknowledged (never the active one)
+        while len(self.segments) > 1 and self.segments[1][0] <= self.acked + 1:
+            os.remove(self.segments.popleft()[1])
+
+    def stage(self, ops, count):
+        """Persists the ops that replace the `count` oldest items as the in-flight plan"""
+        self.plan = {'through': self.items[count - 1]['seq'], 'count': count, 'ops': ops, 'done': 0}
+        if os.path.exists(self.plan_done_file): os.remove(self.plan_done_file)
+        self._write_atomic(self.plan_file, json.dumps({k: v for k, v in self.plan.items() if k != 'done'}))
+        return self.plan
+
+    def mark_done(self, done):
+        """Records that the first `done` ops of the plan were applied"""
+        self.plan['done'] = done
+        self._write_atomic(self.plan_done_file, str(done))
+
+    def commit_plan(self):
+        """Acks the items covered by the plan and discards it"""
+        self.ack(self.plan['count'])
+        self.plan = None
+        self._clear_plan_files()
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(list(self.items))
@@ -0,0 +1,40 @@
+class Transaction:
+    """Changes staged against SheetsService and committed together.
+
+    Reads go through the transaction, so they see its own staged writes.
+    Nothing reaches the store or the sync queue until SheetsService commits
+    it at the end of a `with service.transaction()` block; an exception
+    inside the block discards every staged change.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.changes = [] # (action, resource, id_val, record) in order
+        self.staged = {}  # (resource, str(id)) -> latest record, or None once deleted
+
+    def get(self, resource, id_val):
+        key = (resource, str(id_val))
+        if key in self.staged:
+            return self.staged[key]
+        return self.store.get(resource, id_val)
+
+    def create(self, resource, record):
+        self.staged[(resource, str(record.get('id')))] = record
+        self.changes.append(('create', resource, None, record))
+        return record
+
+    def update(self, resource, id_val, updates):
+        current = self.get(resource, id_val)
+        if current is None:
+            return None
+        record = {**current, **updates, 'id': current.get('id')} # The id is the key: never changed by an update
+        self.staged[(resource, str(id_val))] = record
+        self.changes.append(('update', resource, id_val, record))
+        return record
+
+    def delete(self, resource, id_val):
+        if self.get(resource, id_val) is None:
+            return False
+        self.staged[(resource, str(id_val))] = None
+        self.changes.append(('delete', resource, id_val, None))
+        return True
@@ -1,4 +1,6 @@
-from flask import jsonify
+from flask import jsonify, request, current_app
+from collections import OrderedDict
+import threading
 import random
 import datetime
 
@@ -12,3 +14,113 @@ def generate_id(prefix):
 
 def today():
     return datetime.date.today().isoformat()
+
+# Most records accepted by one bulk create request
+MAX_BULK_ITEMS = 10000
+
+def bulk_create(service, resource, prefix, items, build):
+    """Creates many records in one batch (see SheetsService.create_many).
+
+    `build(data, new_id)` turns one request item into a record, raising
+    KeyError/ValueError if it is invalid. Invalid items are skipped; the rest
+    are created together. Returns one result per item, in request order.
+    Raises ValueError if `items` is not a list or is too long.
+    """
+    if not isinstance(items, list):
+        raise ValueError("Expected a JSON array of records")
+    if len(items) > MAX_BULK_ITEMS:
+        raise ValueError(f"At most {MAX_BULK_ITEMS} records per request")
+
+    records, results, taken = [], [], set()
+    for i, data in enumerate(items):
+        new_id = generate_id(prefix)
+        while new_id in taken or service.get_by_id(resource, new_id):
+            new_id = generate_id(prefix)
+        try:
+            if not isinstance(data, dict):
+                raise ValueError("Record must be a JSON object")
+            record = build(data, new_id)
+        except KeyError as e:
+            results.append({"index": i, "code": 1001, "message": f"{e.args[0]} is required"})
+            continue
+        except (TypeError, ValueError) as e:
+            results.append({"index": i, "code": 1001, "message": str(e)})
+            continue
+        taken.add(new_id)
+        records.append(record)
+        results.append({"index": i, "code": 0, "id": new_id})
+
+    service.create_many(resource, records)
+    return results
+
+# Largest page a list endpoint returns when `limit` is given
+MAX_PAGE_SIZE = 1000
+
+def list_params(args, filters):
+    """Reads the shared list query parameters: limit, cursor, sort, dateFrom, dateTo,
+    plus the equality filters in `filters` (query parameter -> record field).
+    Raises ValueError on a bad limit."""
+    params = {
+        "filters": {field: args.get(name) for name, field in filters.items() if args.get(name)},
+        "date_from": args.get('dateFrom'),
+        "date_to": args.get('dateTo'),
+        "sort": args.get('sort'),
+        "cursor": args.get('cursor'),
+        "limit": None
+    }
+    if args.get('limit'):
+        try:
+            limit = int(args.get('limit'))
+        except ValueError:
+            raise ValueError("limit must be an integer")
+        if limit < 1:
+            raise ValueError("limit must be positive")
+        params["limit"] = min(limit, MAX_PAGE_SIZE)
+    return params
+
+# Serialized bodies of recent GET responses: full path -> (version, body)
+RESPONSE_CACHE_BYTES = 64 * 1024 * 1024
+_response_cache = OrderedDict()
+_response_cache_size = 0
+_response_cache_lock = threading.Lock()
+
+def cached_response(version, build):
+    """Serves a GET whose content only changes with `version` (see SheetsService.version_of).
+
+    Sends the version as ETag, answers a matching If-None-Match with 304 and
+    reuses the serialized body while the version is unchanged. `build` returns
+    a response() tuple; only successful responses are cached.
+    """
+    global _response_cache_size
+    if request.if_none_match.contains_weak(version): # Compressed responses carry W/ tags
+        res = current_app.response_class(status=304)
+    else:
+        key = request.full_path
+        with _response_cache_lock:
+            hit = _response_cache.get(key)
+            if hit and hit[0] == version:
+                _response_cache.move_to_end(key)
+            else:
+                hit = None
+
+        if hit:
+            body = hit[1]
+        else:
+            res, status = build()
+            if status != 200:
+                return res, status
+            body = res.get_data()
+            if len(body) <= RESPONSE_CACHE_BYTES:
+                with _response_cache_lock:
+                    old = _response_cache.pop(key, None)
+                    if old: _response_cache_size -= len(old[1])
+                    _response_cache[key] = (version, body)
+                    _response_cache_size += len(body)
+                    while _response_cache_size > RESPONSE_CACHE_BYTES:
+                        _, (_, evicted) = _response_cache.popitem(last=False)
+                        _response_cache_size -= len(evicted)
+        res = current_app.response_class(body, mimetype='application/json')
+
+    res.set_etag(version)
+    res.headers['Cache-Control'] = 'no-cache' # Browsers revalidate with If-None-Match
+    return res
@@ -14,6 +14,17 @@ const KEYS = {
     deposits: 'deposits'
 };
 
+// Records this client just changed, as 'collection:id' -> time marked. Their live
+// change events are skipped: the view already reloads after its own saves.
+const ownChanges = new Map();
+const OWN_CHANGE_MS = 10000;
+
+const markOwn = (collection, id) => {
+    const now = Date.now();
+    for (const [key, time] of ownChanges) if (now - time > OWN_CHANGE_MS) ownChanges.delete(key);
+    ownChanges.set(`${collection}:${id}`, now);
+};
+
 const request = async (endpoint, method = 'GET', body = null) => {
     const options = {
         method,
@@ -66,17 +77,58 @@ export const API = {
     create: async (collection, data) => {
         const json = await request(collection, 'POST', data);
         const singularKey = collection.slice(0, -1);
+        if (json[singularKey]) markOwn(collection, json[singularKey].id);
         return json[singularKey];
     },
 
     update: async (collection, id, updates) => {
+        markOwn(collection, id);
         const json = await request(`${collection}/${id}`, 'PATCH', updates);
         const singularKey = collection.slice(0, -1);
         return json[singularKey];
     },
 
     delete: async (collection, id) => {
+        markOwn(collection, id);
         await request(`${collection}/${id}`, 'DELETE');
         return true;
+    },
+
+    // True once for the change event of a record this client just saved or deleted
+    isOwnChange: (resource, id) => {
+        const key = `${resource.toLowerCase()}:${id}`;
+        const time = ownChanges.get(key);
+        if (time === undefined) return false;
+        ownChanges.delete(key);
+        return Date.now() - time <= OWN_CHANGE_MS;
+    },
+
+    // --- AGGREGATES ---
+    // Vendors with outstanding, openBills and lastActivity, maintained by the backend
+    getVendorSummary: async () => {
+        const json = await request('vendors/summary');
+        return json.vendors || [];
+    },
+
+    // One page of a wallet's payments and deposits, newest first, with the balance after each
+    getWalletHistory: async (id, cursor = null) => {
+        const json = await request(`wallets/${id}/history${cursor ? `?cursor=${encodeURIComponent(cursor)}` : ''}`);
+        return { history: json.history || [], next_cursor: json.next_cursor };
+    },
+
+    // Records whose foreign key `field` equals `value`, e.g. a vendor's expenses
+    getRelated: async (collection, field, value) => {
+        const json = await request(`${collection}?${field}=${encodeURIComponent(value)}`);
+        return json[KEYS[collection]] || [];
+    },
+
+    // --- LIVE UPDATES ---
+    // Calls onEvent(type, data) for each 'change', 'sync' and 'reset' event of /v1/changes.
+    // EventSource reconnects on its own and resumes from the last event it received.
+    subscribeChanges: (onEvent) => {
+        const source = new EventSource(`${BASE_URL}/changes`);
+        ['change', 'sync', 'reset'].forEach(type =>
+            source.addEventListener(type, (e) => onEvent(type, JSON.parse(e.data))));
+        return source;
     }
 };
\ No newline at end of file
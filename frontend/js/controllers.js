@@ -6,24 +6,29 @@ import { API } from './api.js?v=5';
 import { utils } from './utils.js';
 import { ui } from './ui.js?v=4';
 import { router } from './router.js';
+import { store } from './store.js';
 
 export const Controllers = {
     // --- EXPENSES MODULE ---
     expenses: {
         list: async () => {
-            const data = await API.get('expenses');
-            const rows = data.map(e => ({
-                id: e.id,
-                cells: [
-                    `<span class="font-mono text-xs text-gray-500 bg-gray-100 px-2 py-1 rounded">${e.id}</span>`,
-                    `<span class="font-medium text-gray-900">${utils.getVendorName(e.vendorId)}</span>`,
-                    e.date,
-                    utils.formatCurrency(e.total),
-                    `<span class="font-bold text-gray-700">${utils.formatCurrency(e.balance)}</span>`,
-                    `<span class="px-2.5 py-0.5 text-xs font-semibold rounded-full ${utils.getStatusClass(e.status)}">${e.status}</span>`
-                ]
-            }));
-            ui.renderTable(['ID', 'Vendor', 'Date', 'Total', 'Balance', 'Status'], rows);
+            Controllers.expenses.render(await API.get('expenses'));
+        },
+        // Table row for one expense (also used to patch rows from live changes)
+        row: (e) => ({
+            id: e.id,
+            cells: [
+                `<span class="font-mono text-xs text-gray-500 bg-gray-100 px-2 py-1 rounded">${e.id}</span>`,
+                `<span class="font-medium text-gray-900">${utils.getVendorName(e.vendorId)}</span>`,
+                e.date,
+                utils.formatCurrency(e.total),
+                `<span class="font-bold text-gray-700">${utils.formatCurrency(e.balance)}</span>`,
+                `<span class="px-2.5 py-0.5 text-xs font-semibold rounded-full ${utils.getStatusClass(e.status)}">${e.status}</span>`
+            ]
+        }),
+        render: (data) => {
+            store.setState('rows', new Map(data.map(e => [e.id, e])));
+            ui.renderTable(['ID', 'Vendor', 'Date', 'Total', 'Balance', 'Status'], data.map(Controllers.expenses.row));
         },
         detail: async (id) => {
             const e = await API.getById('expenses', id);
@@ -107,29 +112,29 @@ export const Controllers = {
     // --- VENDORS MODULE ---
     vendors: {
         list: async () => {
-            const vendors = await API.get('vendors');
-            const expenses = await API.get('expenses');
-
-            const rows = vendors.map(v => {
-                const debt = expenses
-                    .filter(e => e.vendorId === v.id && e.status !== 'Paid')
-                    .reduce((sum, e) => sum + e.balance, 0);
-                return {
-                    id: v.id,
-                    cells: [
-                        `<span class="font-mono text-xs text-gray-500">${v.id}</span>`,
-                        `<span class="font-semibold text-gray-900">${v.name}</span>`,
-                        v.address,
-                        `<span class="font-bold ${debt > 0 ? 'text-red-600' : 'text-green-600'}">${utils.formatCurrency(debt)}</span>`
-                    ]
-                };
-            });
-            ui.renderTable(['ID', 'Name', 'Address', 'Balance Due'], rows);
+            Controllers.vendors.render(await API.getVendorSummary());
+        },
+        // Table row for one vendor summary (vendor fields plus outstanding)
+        row: (v) => {
+            const debt = v.outstanding || 0;
+            return {
+                id: v.id,
+                cells: [
+                    `<span class="font-mono text-xs text-gray-500">${v.id}</span>`,
+                    `<span class="font-semibold text-gray-900">${v.name}</span>`,
+                    v.address,
+                    `<span class="font-bold ${debt > 0 ? 'text-red-600' : 'text-green-600'}">${utils.formatCurrency(debt)}</span>`
+                ]
+            };
+        },
+        render: (vendors) => {
+            store.setState('rows', new Map(vendors.map(v => [v.id, v])));
+            ui.renderTable(['ID', 'Name', 'Address', 'Balance Due'], vendors.map(Controllers.vendors.row));
         },
         detail: async (id) => {
             const v = await API.getById('vendors', id);
-            const expenses = await API.get('expenses');
-            const unpaidExpenses = expenses.filter(e => e.vendorId === v.id && e.status !== 'Paid');
+            const expenses = await API.getRelated('expenses', 'vendorId', v.id);
+            const unpaidExpenses = expenses.filter(e => e.status !== 'Paid');
             const debt = unpaidExpenses.reduce((sum, e) => sum + e.balance, 0);
 
             const html = `
@@ -189,36 +194,50 @@ export const Controllers = {
     // --- WALLETS MODULE ---
     wallets: {
         list: async () => {
-            const data = await API.get('wallets');
-            const rows = data.map(w => ({
-                id: w.id,
-                cells: [
-                    `<span class="font-mono text-xs text-gray-500">${w.id}</span>`,
-                    `<span class="font-semibold text-gray-900">${w.name}</span>`,
-                    w.currency,
-                    `<span class="font-bold text-blue-700">${utils.formatCurrency(w.balance)}</span>`
-                ]
-            }));
-            ui.renderTable(['ID', 'Wallet Name', 'Currency', 'Current Balance'], rows);
+            Controllers.wallets.render(await API.get('wallets'));
+        },
+        row: (w) => ({
+            id: w.id,
+            cells: [
+                `<span class="font-mono text-xs text-gray-500">${w.id}</span>`,
+                `<span class="font-semibold text-gray-900">${w.name}</span>`,
+                w.currency,
+                `<span class="font-bold text-blue-700">${utils.formatCurrency(w.balance)}</span>`
+            ]
+        }),
+        render: (data) => {
+            store.setState('rows', new Map(data.map(w => [w.id, w])));
+            ui.renderTable(['ID', 'Wallet Name', 'Currency', 'Current Balance'], data.map(Controllers.wallets.row));
         },
         detail: async (id) => {
             const w = await API.getById('wallets', id);
-            const payments = await API.get('payments');
-            const deposits = await API.get('deposits');
-
-            const walletPayments = payments.filter(p => p.walletId === id).map(p => ({
-                ...p, type: 'payment',
-                label: `To: ${utils.getVendorName(p.vendorId)}`,
-                sign: '-', color: 'text-red-600'
-            }));
-
-            const walletDeposits = deposits.filter(d => d.walletId === id).map(d => ({
-                ...d, type: 'deposit',
-                label: `From: ${d.vendorId ? utils.getVendorName(d.vendorId) : d.source}`,
-                sign: '+', color: 'text-green-600'
-            }));
-
-            const history = [...walletPayments, ...walletDeposits].sort((a, b) => new Date(b.date) - new Date(a.date));
+            // Sorted, paginated and balanced by the backend
+            const page = await API.getWalletHistory(id);
+            const history = page.history;
+
+            const renderEntries = (entries) => entries.map(h => {
+                const label = h.type === 'deposit'
+                    ? `From: ${h.vendorId ? utils.getVendorName(h.vendorId) : h.source}`
+                    : `To: ${utils.getVendorName(h.vendorId)}`;
+                const sign = h.type === 'deposit' ? '+' : '-';
+                const color = h.type === 'deposit' ? 'text-green-600' : 'text-red-600';
+                return `
+                        <div class="flex items-center justify-between p-3 bg-white border border-gray-100 rounded-lg shadow-sm hover:bg-gray-50 transition-colors">
+                            <div class="flex items-center">
+                                <div class="w-8 h-8 rounded-full ${h.type === 'deposit' ? 'bg-green-100 text-green-600' : 'bg-red-100 text-red-600'} flex items-center justify-center mr-3">
+                                    <i data-lucide="${h.type === 'deposit' ? 'arrow-down-left' : 'arrow-up-right'}" class="w-4 h-4"></i>
+                                </div>
+                                <div>
+                                    <p class="text-xs text-gray-500">${h.date}</p>
+                                    <p class="text-sm font-medium text-gray-800">${label}</p>
+                                </div>
+                            </div>
+                            <div class="text-right">
+                                <span class="${color} font-bold text-sm">${sign}${utils.formatCurrency(h.amount)}</span>
+                                <p class="text-xs text-gray-400">${utils.formatCurrency(h.balance)}</p>
+                            </div>
+                        </div>`;
+            }).join('');
 
             const html = `
                 <div class="bg-gradient-to-br from-blue-600 to-indigo-700 rounded-xl p-6 text-white mb-8 shadow-lg relative overflow-hidden">
@@ -229,27 +248,25 @@ export const Controllers = {
                 </div>
                 <div>
                     <h4 class="font-bold text-gray-700 mb-4 text-sm uppercase tracking-wide border-b pb-2 flex items-center"><i data-lucide="history" class="w-4 h-4 mr-2"></i> Transaction History</h4>
-                    <div class="space-y-3">
-                        ${history.length === 0 ? '<p class="text-sm text-gray-400 italic">No transactions recorded yet.</p>' :
-                    history.map(h => `
-                        <div class="flex items-center justify-between p-3 bg-white border border-gray-100 rounded-lg shadow-sm hover:bg-gray-50 transition-colors">
-                            <div class="flex items-center">
-                                <div class="w-8 h-8 rounded-full ${h.type === 'deposit' ? 'bg-green-100 text-green-600' : 'bg-red-100 text-red-600'} flex items-center justify-center mr-3">
-                                    <i data-lucide="${h.type === 'deposit' ? 'arrow-down-left' : 'arrow-up-right'}" class="w-4 h-4"></i>
-                                </div>
-                                <div>
-                                    <p class="text-xs text-gray-500">${h.date}</p>
-                                    <p class="text-sm font-medium text-gray-800">${h.label}</p>
-                                </div>
-                            </div>
-                            <span class="${h.color} font-bold text-sm">${h.sign}${utils.formatCurrency(h.amount)}</span>
-                        </div>`).join('')}
+                    <div class="space-y-3" id="wallet-history">
+                        ${history.length === 0 ? '<p class="text-sm text-gray-400 italic">No transactions recorded yet.</p>' : renderEntries(history)}
                     </div>
+                    <button id="wallet-history-more" class="${page.next_cursor ? '' : 'hidden'} w-full mt-3 py-2 text-sm font-medium text-blue-600 hover:bg-blue-50 rounded-lg">Load more</button>
                 </div>`;
             ui.openDetail('WALLET', w.name, html,
                 () => router.openEdit(id),
                 () => ui.confirmDelete(id, (delId) => Controllers.wallets.delete(delId))
             );
+
+            let cursor = page.next_cursor;
+            const moreBtn = document.getElementById('wallet-history-more');
+            moreBtn.onclick = async () => {
+                const next = await API.getWalletHistory(id, cursor);
+                document.getElementById('wallet-history').insertAdjacentHTML('beforeend', renderEntries(next.history));
+                ui.renderIcons();
+                cursor = next.next_cursor;
+                if (!cursor) moreBtn.classList.add('hidden');
+            };
         },
         form: async (id = null) => {
             const data = id ? await API.getById('wallets', id) : { name: '', balance: 0 };
@@ -281,18 +298,21 @@ export const Controllers = {
     // --- PAYMENTS MODULE (Complex) ---
     payments: {
         list: async () => {
-            const data = await API.get('payments');
-            const rows = data.map(p => ({
-                id: p.id,
-                cells: [
-                    `<span class="font-mono text-xs">${p.id}</span>`,
-                    p.date,
-                    `<span class="font-medium text-blue-600">${utils.getVendorName(p.vendorId)}</span>`,
-                    utils.getWalletName(p.walletId),
-                    `<span class="font-bold text-gray-800">${utils.formatCurrency(p.amount)}</span>`
-                ]
-            }));
-            ui.renderTable(['ID', 'Date', 'Recipient Vendor', 'Source Wallet', 'Amount Paid'], rows);
+            Controllers.payments.render(await API.get('payments'));
+        },
+        row: (p) => ({
+            id: p.id,
+            cells: [
+                `<span class="font-mono text-xs">${p.id}</span>`,
+                p.date,
+                `<span class="font-medium text-blue-600">${utils.getVendorName(p.vendorId)}</span>`,
+                utils.getWalletName(p.walletId),
+                `<span class="font-bold text-gray-800">${utils.formatCurrency(p.amount)}</span>`
+            ]
+        }),
+        render: (data) => {
+            store.setState('rows', new Map(data.map(p => [p.id, p])));
+            ui.renderTable(['ID', 'Date', 'Recipient Vendor', 'Source Wallet', 'Amount Paid'], data.map(Controllers.payments.row));
         },
         detail: async (id) => {
             const p = await API.getById('payments', id);
@@ -500,8 +520,8 @@ export const Controllers = {
 
                 if (!vendorId) return;
 
-                const expenses = await API.get('expenses');
-                const bills = expenses.filter(x => x.vendorId === vendorId && x.status !== 'Paid');
+                const expenses = await API.getRelated('expenses', 'vendorId', vendorId);
+                const bills = expenses.filter(x => x.status !== 'Paid');
 
                 if (bills.length === 0) {
                     container.innerHTML = '<div class="p-10 text-center text-green-600">No outstanding bills.</div>';
@@ -700,7 +720,7 @@ export const Controllers = {
 
                 document.getElementById('btn-force-pull').onclick = async () => {
                     if (confirm('DANGER: This will delete all local changes and pull everything from Google Sheets. Continue?')) {
-                        await API.req('sync/pull', 'POST');
+                        await API.req('sync/pull', 'POST', { full: true }); // Replace the local cache, not an incremental pull
                         location.reload();
                     }
                 };
@@ -4,6 +4,7 @@
  */
 import { store } from './store.js';
 import { utils } from './utils.js';
+import { API } from './api.js?v=5';
 import { router } from './router.js';
 import { ui } from './ui.js?v=4';
 import { Controllers } from './controllers.js';
@@ -77,6 +78,48 @@ document.addEventListener('DOMContentLoaded', async () => {
         }
     });
 
-    // 6. Initial Route
+    // 7. Live updates: patch caches and the rows on screen from each change instead of reloading
+    const LIST_RESOURCE = { expenses: 'Expenses', vendors: 'Vendors', wallets: 'Wallets', payments: 'Payments' };
+    const NAME_RESOURCES = { expenses: ['Vendors'], payments: ['Vendors', 'Wallets'] }; // Names shown in the rows
+    const SUMMARY_RESOURCES = ['Expenses', 'Payments', 'Deposits']; // Change the vendors' outstanding balance
+    let refreshTimer = null;
+    const refreshView = () => {
+        // Coalesce bursts (e.g. a payment touching several expenses) into one reload
+        clearTimeout(refreshTimer);
+        refreshTimer = setTimeout(() => router.registry[store.currentView].list(), 300);
+    };
+    const patchRow = (controller, data) => {
+        if (data.action === 'delete') {
+            store.rows.delete(data.id);
+            ui.removeRow(data.id);
+            return;
+        }
+        // A vendors row also carries its summary fields, which the record lacks
+        const record = { ...(store.rows.get(data.id) || {}), ...data.record };
+        store.rows.set(data.id, record);
+        if (!ui.upsertRow(controller.row(record))) controller.render([...store.rows.values()]);
+    };
+    API.subscribeChanges((type, data) => {
+        const view = store.currentView;
+        const controller = router.registry[view];
+        if (type === 'change') {
+            utils.applyChange(data);
+            if (API.isOwnChange(data.resource, data.id)) return; // Reloaded by the view after saving
+            if (store.tableView !== view) return; // Its list is still loading
+            if (LIST_RESOURCE[view] === data.resource) {
+                patchRow(controller, data);
+            } else if ((NAME_RESOURCES[view] || []).includes(data.resource)) {
+                controller.render([...store.rows.values()]); // Names come from the patched cache
+            } else if (view === 'vendors' && SUMMARY_RESOURCES.includes(data.resource)) {
+                refreshView(); // Outstanding balances are computed by the backend
+            }
+        } else if (type === 'reset') {
+            utils.refreshCache().then(refreshView);
+        } else if (type === 'sync' && view === 'settings') {
+            refreshView();
+        }
+    });
+
+    // 8. Initial Route
     router.navigate('expenses');
 });
@@ -4,6 +4,8 @@
 export const store = {
     currentView: 'expenses',
     selectedId: null,
+    rows: new Map(), // id -> record of the list on screen, patched by live changes
+    tableView: null, // View whose list the table on screen shows
 
     // Simple state setter
     setState(key, value) {
@@ -59,6 +59,7 @@ export const ui = {
     renderTable: (columns, rows, onRowClickName) => {
         const container = document.getElementById('main-view');
         if (!container) return;
+        store.tableView = store.currentView;
 
         if (rows.length === 0) {
             container.innerHTML = `<div class="p-10 text-center text-gray-500 bg-white rounded-lg border border-gray-200 shadow-sm">No records found. Click "New" to create one.</div>`;
@@ -82,7 +83,15 @@ export const ui = {
         `;
 
         rows.forEach(row => {
-            html += `<tr class="hover:bg-blue-50 cursor-pointer transition-colors group table-row-item" data-id="${row.id}">
+            html += ui.rowHtml(row);
+        });
+
+        html += `</tbody></table></div>`;
+        container.innerHTML = html;
+        ui.renderIcons();
+    },
+
+    rowHtml: (row) => `<tr class="hover:bg-blue-50 cursor-pointer transition-colors group table-row-item" data-id="${row.id}">
                 ${row.cells.map(cell => `<td class="px-6 py-4 whitespace-nowrap text-sm text-gray-700">${cell}</td>`).join('')}
                 <td class="px-6 py-4 whitespace-nowrap text-right text-sm font-medium">
                     <button data-action="edit" data-id="${row.id}" class="text-blue-600 hover:text-blue-800 opacity-0 group-hover:opacity-100 transition-opacity mr-4" title="Edit">
@@ -92,12 +101,25 @@ export const ui = {
                         <i data-lucide="trash-2" class="w-4 h-4 pointer-events-none"></i>
                     </button>
                 </td>
-            </tr>`;
-        });
-
-        html += `</tbody></table></div>`;
-        container.innerHTML = html;
+            </tr>`,
+
+    // --- Live row patches (see index.js) ---
+    // Replaces the row with the same id, or appends it. Returns false when no table is shown.
+    upsertRow: (row) => {
+        const tbody = document.querySelector('#main-view tbody');
+        if (!tbody) return false;
+        const template = document.createElement('template');
+        template.innerHTML = ui.rowHtml(row).trim();
+        const existing = tbody.querySelector(`tr[data-id="${CSS.escape(row.id)}"]`);
+        if (existing) existing.replaceWith(template.content.firstChild);
+        else tbody.appendChild(template.content.firstChild);
         ui.renderIcons();
+        return true;
+    },
+
+    removeRow: (id) => {
+        const tr = document.querySelector(`#main-view tr[data-id="${CSS.escape(id)}"]`);
+        if (tr) tr.remove();
     },
 
     // --- Detail Panel ---
@@ -16,6 +16,20 @@ const loadCache = async () => {
     cachedWallets = wallets;
 };
 
+// Applies one /v1/changes record event to the name caches
+const applyChange = (change) => {
+    const list = { Vendors: cachedVendors, Wallets: cachedWallets }[change.resource];
+    if (!list) return;
+    const i = list.findIndex(r => r.id === change.id);
+    if (change.action === 'delete') {
+        if (i >= 0) list.splice(i, 1);
+    } else if (i >= 0) {
+        list[i] = change.record;
+    } else {
+        list.push(change.record);
+    }
+};
+
 export const utils = {
     init: async () => {
         await loadCache();
@@ -37,5 +51,8 @@ export const utils = {
     today: () => new Date().toISOString().split('T')[0],
 
     // Refresh cache if needed (e.g., after adding a vendor)
-    refreshCache: async () => await loadCache()
+    refreshCache: async () => await loadCache(),
+
+    // Patch the cache from a live change event instead of reloading it
+    applyChange
 };
\ No newline at end of file